@@ -1,3 +1,57 @@
-from .driver import FIU
-from .fiu_types import DefaultPortSettings
-from .interfaces import RS485
\ No newline at end of file
+#Public names are loaded from their submodule on first attribute access (PEP 562), so importing fiu 
+#for the state model and safety checks does not pull in pyserial, asyncio or the transport layer
+from importlib import import_module
+
+#public name -> submodule providing it
+_EXPORTS = {
+    "FIU": "driver",
+    "FIUTransaction": "driver",
+    "AsyncFIU": "async_driver",
+    "AsyncRS485": "async_driver",
+    "RelayMonitor": "monitor",
+    "FIUSystem": "orchestrator",
+    "CampaignPlanner": "planner",
+    "PlanStage": "planner",
+    "FIUSession": "session",
+    "FIUSessionServer": "session",
+    "FIUSessionClient": "session",
+    "FaultSequence": "sequence",
+    "SequenceStep": "sequence",
+    "StepResult": "sequence",
+    "CacheSettings": "fiu_types",
+    "RetryPolicy": "fiu_types",
+    "DefaultPortSettings": "fiu_types",
+    "FIUState": "fiu_types",
+    "FIUException": "fiu_types",
+    "FIUTimeoutError": "fiu_types",
+    "FIUChecksumError": "fiu_types",
+    "FIUResponseError": "fiu_types",
+    "FIUCommandError": "fiu_types",
+    "StateManager": "fiu_types",
+    "SystemSnapshot": "fiu_types",
+    "CommInterface": "interfaces",
+    "RS485": "interfaces",
+    "InterfacePool": "pool",
+    "default_pool": "pool",
+    "CommandMetrics": "metrics",
+    "CommandRecord": "metrics",
+    "CommandJournal": "journal",
+    "read_journal": "journal",
+    "SimulatedFIU": "simulator",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    #cache on the package so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
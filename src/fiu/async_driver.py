@@ -0,0 +1,219 @@
+import asyncio
+from functools import partial
+from .driver import *
+
+class AsyncRS485(CommInterface):
+    """asyncio front end for an RS485 interface (or any other CommInterface).
+    Blocking serial I/O runs in the event loop's default executor so commands on separate ports run 
+    concurrently, while commands on the same half-duplex bus are serialized by a per-bus lock."""
+    def __init__(self, port: str, port_settings: DefaultPortSettings = DefaultPortSettings(), 
+                 interface: CommInterface = None) -> None:
+        self.resource = port
+        self.interface = interface if interface is not None else RS485(port, port_settings)
+        self._lock = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Lock serializing access to the bus, created on first use so it belongs to the running event loop"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def run(self, func, *args, **kwargs):
+        """Runs a blocking call that uses the bus in the default executor, once all prior calls on the bus have completed"""
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+
+    async def open(self) -> None:
+        """Opens an RS-485 connection to the FIU."""
+        await self.run(self.interface.open)
+
+    async def close(self) -> None:
+        """Closes a connection to the FIU."""
+        await self.run(self.interface.close)
+
+    async def write_cmd(self, msg: str, timeout: float = None) -> str:
+        """Write a message out to the serial device and return the parsed return data"""
+        return await self.run(self.interface.write_cmd, msg, timeout)
+
+    async def write_frame(self, frame: bytes, timeout: float = None) -> bytes:
+        """Write a ready to send command frame out to the serial device and return the response data"""
+        return await self.run(self.interface.write_frame, frame, timeout)
+
+    async def write_frames(self, frames: list, timeout: float = None) -> list:
+        """Write a list of command frames out to the serial device and return the response data for each"""
+        return await self.run(self.interface.write_frames, frames, timeout)
+
+    async def write_cmds(self, msgs: list, timeout: float = None) -> list:
+        """Write a list of messages out to the serial device and return the parsed return data for each"""
+        return await self.run(self.interface.write_cmds, msgs, timeout)
+
+
+class AsyncFIU(object):
+    """asyncio Driver class for the Bloomy Fault Insertion Unit
+       Provides awaitable versions of the FIU driver methods. Each AsyncFIU drives one RS-485 bus;
+       FIU objects on separate buses may be used concurrently from a single event loop."""
+
+    def __init__(self, mod_ids: list, comm_resource: str, interface: AsyncRS485 = None) -> None:
+        """Constructor for the asyncio FIU driver. An AsyncRS485 interface is created for comm_resource
+        unless an existing one is provided, e.g. to share a bus between multiple AsyncFIU objects.
+        """
+        self.interface = interface if interface is not None else AsyncRS485(comm_resource)
+        self.fiu = FIU(mod_ids, comm_resource, self.interface.interface)
+        self.module_IDs = self.fiu.module_IDs
+        self.resource = comm_resource
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.interface.run(self.fiu.__exit__, exc_type, exc_value, traceback)
+
+    async def connect(self) -> None:
+        await self.interface.run(self.fiu.connect)
+
+    async def disconnect(self) -> None:
+        await self.interface.run(self.fiu.disconnect)
+
+    def configure(self, shared_dmm: bool) -> None:
+        """Set whether the system is using a shared DMM across multiple FIUs."""
+        self.fiu.configure(shared_dmm)
+
+    def enable_metrics(self, hook=None) -> CommandMetrics:
+        """Starts collecting per-command latency, throughput, and error metrics on the FIU's interface."""
+        return self.fiu.enable_metrics(hook)
+
+    def disable_metrics(self) -> None:
+        """Stops collecting per-command metrics"""
+        self.fiu.disable_metrics()
+
+    def metrics(self) -> dict:
+        """Returns a snapshot of the collected metrics as a dictionary, or None if metrics are disabled"""
+        return self.fiu.metrics()
+
+    async def enable_journal(self, path: str) -> CommandJournal:
+        """Starts recording every frame sent to and received from the FIU to the command journal at path."""
+        return await self.interface.run(self.fiu.enable_journal, path)
+
+    async def disable_journal(self) -> None:
+        """Stops recording frames and closes the command journal"""
+        await self.interface.run(self.fiu.disable_journal)
+
+    def start_monitor(self, interval: float = 1.0, max_interval: float = 10.0, on_change=None, 
+                      on_interlock=None, on_error=None) -> "RelayMonitor":
+        """Starts a background RelayMonitor whose callbacks run on the running event loop. 
+        Await monitor.wait_for_change() to wait for the next relay or interlock change."""
+        return self.fiu.start_monitor(interval, max_interval, on_change, on_interlock, on_error, asyncio.get_running_loop())
+
+    def stop_monitor(self) -> None:
+        """Stops the background relay monitor, if running"""
+        self.fiu.stop_monitor()
+
+    def configure_cache(self, settings: CacheSettings) -> None:
+        """Set whether relay_state answers from the driver's state manager, and how often it is re-queried from hardware."""
+        self.fiu.configure_cache(settings)
+
+    def configure_retry(self, policy: RetryPolicy) -> None:
+        """Set how commands that time out or fail checksum validation are retried, and whether a module's state
+        is read back from hardware when a state change fails."""
+        self.fiu.configure_retry(policy)
+
+    async def set_open_circuit_fault(self, mod_id: int, channel: int, enable_disable: bool = True) -> None:
+        """Enable (True = disconnect) or disable (False = connect) an open circuit fault at a specified channel."""
+        await self.interface.run(self.fiu.set_open_circuit_fault, mod_id, channel, enable_disable)
+
+    async def set_open_circuit_fault_all(self, enable_disable: bool = True) -> None:
+        """Enable (True = disconnect) or disable (False = connect) open circuit faults at all channels in the system."""
+        await self.interface.run(self.fiu.set_open_circuit_fault_all, enable_disable)
+
+    async def set_channel_connected(self, mod_id: int, channel: int) -> None:
+        """Dedicated method to set open circuit fault state of the provided channel to CONNECTED"""
+        await self.interface.run(self.fiu.set_channel_connected, mod_id, channel)
+
+    async def connect_channels_all(self) -> None:
+        """Dedicated method to set all channels on every FIU on serial bus to CONNECTED state"""
+        await self.interface.run(self.fiu.connect_channels_all)
+
+    async def set_short_circuit_fault(self, mod_id: int, channel: int) -> None:
+        """Sets a fault to ground at the specified channel."""
+        await self.interface.run(self.fiu.set_short_circuit_fault, mod_id, channel)
+
+    async def set_voltage_measurement(self, mod_id: int, channel: int) -> None:
+        """Sets the specified channel to voltage mode for DMM cell voltage measurement."""
+        await self.interface.run(self.fiu.set_voltage_measurement, mod_id, channel)
+
+    async def set_current_measurement(self, mod_id: int, channel: int) -> None:
+        """Sets the specified channel to current mode for DMM bypass current measurement."""
+        await self.interface.run(self.fiu.set_current_measurement, mod_id, channel)
+
+    async def apply(self, changes: list) -> None:
+        """Sets the state of multiple channels as a single validated transaction."""
+        await self.interface.run(self.fiu.apply, changes)
+
+    async def validate(self, changes: list) -> list:
+        """Validates a list of (mod_id, channel, FIUState) changes applied in order without sending any commands."""
+        return await self.interface.run(self.fiu.validate, changes)
+
+    async def compare_and_set(self, mod_id: int, channel: int, expected: FIUState, state: FIUState) -> bool:
+        """Sets the channel to state only if the state manager shows it in the expected state. Returns whether the channel was changed."""
+        return await self.interface.run(self.fiu.compare_and_set, mod_id, channel, expected, state)
+
+    async def bus_users(self) -> list:
+        """Returns the (mod_id, channel, FIUState) of every channel the state manager shows using the DMM or fault bus"""
+        return await self.interface.run(self.fiu.bus_users)
+
+    def transaction(self) -> "AsyncFIUTransaction":
+        """Returns a transaction that applies its changes as a single batch when the async with statement is exited"""
+        return AsyncFIUTransaction(self)
+
+    async def relay_state(self, mod_id: int, cached: bool = None) -> list:
+        """Returns the FIUState of every channel on the provided FIU module."""
+        return await self.interface.run(self.fiu.relay_state, mod_id, cached)
+
+    async def reconcile(self, mod_ids: list = None) -> dict:
+        """Reads the relay state of each module from the FIU and updates the state manager to match."""
+        return await self.interface.run(self.fiu.reconcile, mod_ids)
+
+    async def snapshot(self) -> SystemSnapshot:
+        """Reads the relay state, interlock state, and software version of every module in one pipelined pass."""
+        return await self.interface.run(self.fiu.snapshot)
+
+    async def software_version(self, mod_id: int) -> str:
+        """Returns the current version of the software running on the FIU."""
+        return await self.interface.run(self.fiu.software_version, mod_id)
+
+    async def interlock_state(self, mod_id: int) -> bool:
+        """Returns the state of the 24V interlock input on the FIU (Active or Inactive)."""
+        return await self.interface.run(self.fiu.interlock_state, mod_id)
+
+    async def interlock_override(self, mod_id: int, enable_disable: bool) -> None:
+        """Sets the 24V interlock input on the FIU to active (enable) or inactive (disable)."""
+        await self.interface.run(self.fiu.interlock_override, mod_id, enable_disable)
+
+
+class AsyncFIUTransaction(object):
+    """Collects channel state changes to be applied to an AsyncFIU as a single batch when the 
+    async with statement is exited, or when apply is awaited."""
+
+    def __init__(self, fiu: AsyncFIU) -> None:
+        self.fiu = fiu
+        self.changes = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.apply()
+
+    def set_state(self, mod_id: int, channel: int, state: FIUState) -> "AsyncFIUTransaction":
+        """Adds a channel state change to the transaction"""
+        self.changes.append((mod_id, channel, state))
+        return self
+
+    async def apply(self) -> None:
+        """Applies all collected changes to the FIU and clears the transaction"""
+        changes, self.changes = self.changes, []
+        await self.fiu.apply(changes)
@@ -0,0 +1,88 @@
+"""Bytes level codec for the FIU wire protocol, shared by every communication interface.
+
+Command frame:  command characters, checksum (uppercase hex, no leading zero), carriage return
+Response frame: return code (1), data, checksum (2 uppercase hex), carriage return
+
+The checksum is the sum of the bytes before it, modulo 256."""
+
+#Response return codes
+RETURN_SUCCESS = 0x30       #'0' Success - No Data
+RETURN_DATA = 0x31          #'1' Success - Data
+RETURN_ERROR = 0x32         #'2' Error message
+RETURN_ERROR_DATA = 0x33    #'3' Error data, e.g. multiple channels shorted to the bus
+
+TERMINATOR = 0x0D
+
+#Uppercase hex digits of every checksum value, for command frames and response frames respectively
+_COMMAND_CRC = [b"%X" % value for value in range(256)]
+_RESPONSE_CRC = [b"%02X" % value for value in range(256)]
+_RESPONSE_CRC_VALUES = {**{b"%02x" % value: value for value in range(256)}, 
+                        **{crc: value for value, crc in enumerate(_RESPONSE_CRC)}}
+
+
+def add_CRC(msg: bytes) -> bytes:
+    """Add checksum code and carriage return termination character to a command"""
+    return msg + _COMMAND_CRC[sum(msg) % 256] + b"\r"
+
+def encode_command(buf: bytearray, msg) -> bytearray:
+    """Encodes a command string or bytes into a reusable buffer as a ready to send frame, and returns the buffer"""
+    buf.clear()
+    buf += msg.encode("ascii") if isinstance(msg, str) else msg
+    buf += _COMMAND_CRC[sum(buf) % 256]
+    buf.append(TERMINATOR)
+    return buf
+
+def encode_response(payload: bytes) -> bytes:
+    """Adds the checksum and termination to a response return code and data"""
+    return payload + _RESPONSE_CRC[sum(payload) % 256] + b"\r"
+
+def verify_response(frame) -> bool:
+    """Verifies the checksum of a response frame (bytes or memoryview) without copying it"""
+    if len(frame) < 4 or frame[-1] != TERMINATOR:
+        return False
+    crc = _RESPONSE_CRC_VALUES.get(bytes(frame[-3:-1]))
+    return crc is not None and crc == (sum(frame) - frame[-1] - frame[-2] - frame[-3]) % 256
+
+def response_data(frame) -> memoryview:
+    """Returns a view of a response frame's data, without the return code, checksum, and termination"""
+    return memoryview(frame)[1:-3]
+
+
+class FrameDecoder(object):
+    """Incremental splitter of a received byte stream into carriage return terminated frames.
+    Bytes are fed as they arrive, in chunks that may hold partial frames or several frames, 
+    and complete frames are taken out in order. Frame checksums are not verified."""
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._start = 0
+
+    def __len__(self) -> int:
+        """Number of buffered bytes not yet taken out as frames"""
+        return len(self._buffer) - self._start
+
+    def feed(self, data) -> None:
+        """Adds received bytes to the buffer"""
+        self._buffer += data
+
+    def next_frame(self) -> bytes:
+        """Removes and returns the next complete frame including its terminator, or None if there is none"""
+        end = self._buffer.find(b"\r", self._start)
+        if end < 0:
+            return None
+        frame = bytes(memoryview(self._buffer)[self._start:end + 1])
+        self._start = end + 1
+        #discard consumed bytes once they make up most of the buffer
+        if self._start > len(self._buffer) // 2:
+            del self._buffer[:self._start]
+            self._start = 0
+        return frame
+
+    def pending(self) -> bytes:
+        """Returns the bytes of the partial frame received so far"""
+        return bytes(memoryview(self._buffer)[self._start:])
+
+    def clear(self) -> None:
+        """Discards all buffered bytes"""
+        self._buffer.clear()
+        self._start = 0
@@ -1,5 +1,18 @@
 from .fiu_types import *
 from .interfaces import *
+from .frames import *
+import threading
+from functools import wraps
+from time import time, sleep
+
+def synchronized(method):
+    """Decorator serializing calls to an FIU method with the FIU's lock, so each state check 
+    and the command writes that follow it are atomic with respect to other threads"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class FIU(object):
     """RS485 Driver class for the Bloomy Fault Insertion Unit
@@ -7,8 +20,12 @@ class FIU(object):
        and functionality mirroring the functions and capabilities of the 
        Bloomy FIU LabVIEW Driver"""
     
-    def __init__(self, mod_ids: list, comm_resource: str) -> None:
-        """Constructor for 
+    def __init__(self, mod_ids: list, comm_resource: str, interface: CommInterface = None, 
+                 pool: "InterfacePool" = None, reset_on_exit: bool = True) -> None:
+        """Constructor for the FIU driver. An RS485 interface is created for comm_resource 
+        unless an existing CommInterface is provided. If a pool is provided (e.g. fiu.pool.default_pool), 
+        an already open interface is taken from the pool on connect and returned to it on disconnect.
+        reset_on_exit sets whether disconnect reconnects every channel before releasing the interface.
         """
         self.module_IDs = []
         #make sure all Box IDs are in the range required for RS-485 for the Fault Insertion Unit
@@ -24,8 +41,20 @@ class FIU(object):
 
         #Initialize port resource name and create an object for the pyserial RS485 serial subclass 
         self._sharedDMM = False
+        self._lock = threading.RLock()
+        self._cache = CacheSettings()
+        self._retry = RetryPolicy()
+        #retries made since a command last succeeded on its first attempt
+        self._retries_used = 0
         self.resource = comm_resource
-        self.interface = RS485(comm_resource, DefaultPortSettings())
+        self.reset_on_exit = reset_on_exit
+        self._pool = pool
+        self.monitor = None
+        if pool is not None:
+            #taken from the pool when connected
+            self.interface = None
+        else:
+            self.interface = interface if interface is not None else RS485(comm_resource, DefaultPortSettings())
 
 
     def __enter__(self):
@@ -34,145 +63,298 @@ class FIU(object):
 
     def __exit__(self, exc_type, exc_value, traceback): 
         self.disconnect()
-        print(f"Closed connection with FIU on {self.resource}. All channel relays have been reconnected")
+        print(f"Closed connection with FIU on {self.resource}.{' All channel relays have been reconnected' if self.reset_on_exit else ''}")
         if exc_type is not None:
             print("\nExecution type:", exc_type)
             print("\nExecution value:", exc_value)
             print("\nTraceback:", traceback)
     
     def connect(self) -> None:
-        self.interface.open()
+        if self._pool is not None:
+            self.interface = self._pool.acquire(self.resource, DefaultPortSettings(), self.module_IDs)
+            if not self.reset_on_exit:
+                #a pooled interface may come from a session that left channels faulted, so the state manager 
+                #must match the hardware before any state check is made
+                try:
+                    self.reconcile()
+                except BaseException:
+                    self._pool.release(self.interface)
+                    self.interface = None
+                    raise
+        else:
+            self.interface.open()
         print(f"Connection to Fault Insertion Unit Module IDs: {self.module_IDs} established on port {self.resource}")
     
     def disconnect(self) -> None:
-        self.set_open_circuit_fault_all(False)
-        self.interface.close()
+        self.stop_monitor()
+        try:
+            if self.reset_on_exit:
+                self.set_open_circuit_fault_all(False)
+        finally:
+            if self._pool is not None:
+                self._pool.release(self.interface)
+            else:
+                self.interface.close()
         print(f"Connection with FIU Module IDs {self.module_IDs} on {self.resource} has been successfully closed")
 
     def configure(self, shared_dmm: bool) -> None:
         """Set whether the system is using a shared DMM across multiple FIUs."""
         self._sharedDMM = shared_dmm
 
+    def enable_metrics(self, hook=None) -> CommandMetrics:
+        """Starts collecting per-command latency, throughput, and error metrics on the FIU's interface.
+        hook is called with the CommandRecord of every command, if provided."""
+        return self.interface.enable_metrics(hook)
+
+    def disable_metrics(self) -> None:
+        """Stops collecting per-command metrics"""
+        self.interface.disable_metrics()
+
+    def metrics(self) -> dict:
+        """Returns a snapshot of the collected metrics as a dictionary, or None if metrics are disabled"""
+        return self.interface.metrics_snapshot()
+
+    def enable_journal(self, path: str) -> CommandJournal:
+        """Starts recording every frame sent to and received from the FIU to the command journal at path.
+        fiu.journal.replay re-sends the recorded commands to an interface."""
+        return self.interface.enable_journal(path)
+
+    def disable_journal(self) -> None:
+        """Stops recording frames and closes the command journal"""
+        self.interface.disable_journal()
+
+    def start_monitor(self, interval: float = 1.0, max_interval: float = 10.0, on_change=None, 
+                      on_interlock=None, on_error=None, loop=None) -> "RelayMonitor":
+        """Starts a background RelayMonitor that polls one module every interval seconds while the bus is idle, 
+        calling on_change when relay states differ from the state manager and on_interlock when an interlock changes."""
+        from .monitor import RelayMonitor
+        self.stop_monitor()
+        self.monitor = RelayMonitor(self, interval, max_interval, on_change, on_interlock, on_error, loop)
+        self.monitor.start()
+        return self.monitor
+
+    def stop_monitor(self) -> None:
+        """Stops the background relay monitor, if running"""
+        if self.monitor is not None:
+            self.monitor.stop()
+            self.monitor = None
+
+    def configure_cache(self, settings: CacheSettings) -> None:
+        """Set whether relay_state answers from the driver's state manager, and how often it is re-queried from hardware."""
+        self._cache = settings
+
+    def configure_retry(self, policy: RetryPolicy) -> None:
+        """Set how commands that time out or fail checksum validation are retried, and whether a module's state 
+        is read back from hardware when a state change fails."""
+        self._retry = policy
+        self._retries_used = 0
+
+    @synchronized
     def set_open_circuit_fault(self, mod_id: int, channel: int, enable_disable: bool = True) -> None:
         """Enable (True = disconnect) or disable (False = connect) an open circuit fault at a specified channel."""
         if(self.__valid_module(mod_id) and self.__valid_channel(channel)):
-            if enable_disable:
-                #Disconnected state
-                cmd_char = "D"
-                new_state = FIUState.DISCONNECTED
-            else:
-                #Connected state
-                cmd_char = "C"
-                new_state = FIUState.CONNECTED
+            #Disconnected or Connected state
+            new_state = FIUState.DISCONNECTED if enable_disable else FIUState.CONNECTED
             #Check to see if the new open circuit state is a valid transition
             if(self.__check_transition(new_state, mod_id, channel)):
-                #construct the SCPI command to write to the FIU
-                cmd = f"{cmd_char}{mod_id}{channel:02d}"
-                self.interface.write_cmd(cmd)
-                #update the channel's state in the state manager
-                self.__state_mgr.set_channel_state(mod_id, channel, new_state)
+                #write the prebuilt command frame to the FIU and update the channel's state in the state manager
+                self._write_change(CHANNEL_FRAMES[new_state][mod_id][channel], mod_id, channel, new_state)
             else:
                 raise FIUException(5010)
         else:
             raise FIUException(5051)
 
 
+    @synchronized
     def set_open_circuit_fault_all(self, enable_disable: bool = True) -> None:
         """Enable (True = disconnect) or disable (False = connect) open circuit faults at all channels in the system."""
-        if enable_disable:
-            #Disconnected state
-            cmd_char = "D"
-            new_state = FIUState.DISCONNECTED
-        else:
-            #Connected state
-            cmd_char = "C"
-            new_state = FIUState.CONNECTED
+        #Disconnected or Connected state
+        new_state = FIUState.DISCONNECTED if enable_disable else FIUState.CONNECTED
         #set open circuit state for all channels on all modules
-        for box in self.module_IDs:
-            cmd = f"{cmd_char}{box}99"
-            self.interface.write_cmd(cmd)
+        self.__write_all_checked([CHANNEL_FRAMES[new_state][box][99] for box in self.module_IDs], self.module_IDs)
         #Update the state in StateManager
         self.__state_mgr.set_all_state(self.module_IDs, new_state)
 
+    @synchronized
     def set_channel_connected(self, mod_id: int, channel: int) -> None:
         """Dedicated method to set open circuit fault state of the provided channel to CONNECTED"""
         if(self.__valid_module(mod_id) and self.__valid_channel(channel)):
-                cmd = f"C{mod_id}{channel:02d}"
-                self.interface.write_cmd(cmd)
-                self.__state_mgr.set_channel_state(mod_id, channel, FIUState.CONNECTED)
+                self._write_change(CHANNEL_FRAMES[FIUState.CONNECTED][mod_id][channel], mod_id, channel, FIUState.CONNECTED)
 
+    @synchronized
     def connect_channels_all(self) -> None:
             """Dedicated method to set all channels on every FIU on serial bus to CONNECTED state"""
-            for box in self.module_IDs:
-                cmd = f"C{box}99"
-                self.interface.write_cmd(cmd)
+            self.__write_all_checked([CHANNEL_FRAMES[FIUState.CONNECTED][box][99] for box in self.module_IDs], self.module_IDs)
             self.__state_mgr.set_all_state(self.module_IDs, FIUState.CONNECTED)
 
+    @synchronized
     def set_short_circuit_fault(self, mod_id, channel):
         """Sets a fault to ground at the specified channel. 
         (Only one channel in the system can be set to ground fault at a time.)"""
         if(self.__valid_module(mod_id) and self.__valid_channel(channel)):
             #Check to see if the fault state at given channel is a valid transition
             if(self.__check_transition(FIUState.FAULT_TO_GND, mod_id, channel)):
-                #construct the SCPI command to write to the FIU
-                cmd = f"F{mod_id}{channel:02d}"
-                self.interface.write_cmd(cmd)
-                #update the channel's state in the state manager
-                self.__state_mgr.set_channel_state(mod_id, channel, FIUState.FAULT_TO_GND)
+                #write the prebuilt command frame to the FIU and update the channel's state in the state manager
+                self._write_change(CHANNEL_FRAMES[FIUState.FAULT_TO_GND][mod_id][channel], mod_id, channel, FIUState.FAULT_TO_GND)
             else:
                 raise FIUException(5010, channel, FIUState.FAULT_TO_GND.name)
         else:
             raise FIUException(5051)
 
+    @synchronized
     def set_voltage_measurement(self, mod_id, channel):
         """Sets the specified channel to voltage mode for DMM cell voltage measurement. 
         (Only one channel in the system can be set to measurement mode at a time.)"""
         if(self.__valid_module(mod_id) and self.__valid_channel(channel)):
             #Check to see if another channel is set to voltage measurement mode
             if(self.__check_transition(FIUState.VOLT_MEASUREMENT, mod_id, channel)):
-                #construct the SCPI command to write to the FIU
-                cmd = f"V{mod_id}{channel:02d}"
-                self.interface.write_cmd(cmd)
-                #update the channel's state in the state manager
-                self.__state_mgr.set_channel_state(mod_id, channel, FIUState.VOLT_MEASUREMENT)
+                #write the prebuilt command frame to the FIU and update the channel's state in the state manager
+                self._write_change(CHANNEL_FRAMES[FIUState.VOLT_MEASUREMENT][mod_id][channel], mod_id, channel, FIUState.VOLT_MEASUREMENT)
             else:
                 raise FIUException(5010, channel, FIUState.VOLT_MEASUREMENT.name)
         else:
             raise FIUException(5051)
 
+    @synchronized
     def set_current_measurement(self, mod_id, channel):
         """Sets the specified channel to current mode for DMM bypass current measurement. 
         (Only one channel in the system can be set to measurement mode at a time.)"""
         if(self.__valid_module(mod_id) and self.__valid_channel(channel)):
             #Check to see if another channel is set to current measurement
             if(self.__check_transition(FIUState.CURR_MEASUREMENT, mod_id, channel)):
-                #construct the SCPI command to write to the FIU
-                cmd = f"I{mod_id}{channel:02d}"
-                self.interface.write_cmd(cmd)
-                #update the channel's state in the state manager
-                self.__state_mgr.set_channel_state(mod_id, channel, FIUState.CURR_MEASUREMENT)
+                #write the prebuilt command frame to the FIU and update the channel's state in the state manager
+                self._write_change(CHANNEL_FRAMES[FIUState.CURR_MEASUREMENT][mod_id][channel], mod_id, channel, FIUState.CURR_MEASUREMENT)
             else:
                 raise FIUException(5010, channel, FIUState.CURR_MEASUREMENT.name)
         else:
             raise FIUException(5051)
 
-    def relay_state(self, mod_id: int) -> list:
-        """Returns the state for every channel in the FIU system."""
+    @synchronized
+    def apply(self, changes: list) -> None:
+        """Sets the state of multiple channels as a single transaction. changes is a list of 
+        (mod_id, channel, FIUState) tuples applied in order. The entire batch is validated before any 
+        command is sent, and the state manager is updated once every command has succeeded. If a command 
+        fails part way through, the channels already changed are returned to their previous states."""
+        changes = self.validate(changes)
+        #Record the current state of each changed channel so a failed batch can be rolled back
+        previous = [(mod_id, channel, self.__state_mgr.get_channel_state(mod_id, channel)) 
+                    for mod_id, channel, _ in changes]
+        sent = 0
+        try:
+            for mod_id, channel, state in changes:
+                self.__write_checked(CHANNEL_FRAMES[state][mod_id][channel])
+                sent += 1
+        except BaseException as e:
+            #Restore the channels that were changed, including the failed command whose outcome is unknown,
+            #in reverse order so every intermediate state remains safe
+            restored = True
+            for mod_id, channel, state in reversed(previous[:sent+1]):
+                if state in STATE_COMMANDS:
+                    try:
+                        self.__write_checked(CHANNEL_FRAMES[state][mod_id][channel])
+                    except BaseException:
+                        #the failed channel may still be on the bus, so restoring the channels before it
+                        #could give the bus a second user. Their state is read back from hardware instead
+                        restored = False
+                        break
+            if not restored or getattr(e, "retryable", False):
+                self.__resync({mod_id for mod_id, _, _ in previous[:sent+1]})
+            raise
+        self.__state_mgr.set_batch_state(changes)
+
+    def validate(self, changes: list) -> list:
+        """Validates a list of (mod_id, channel, FIUState) changes applied in order against the current state 
+        of the system, without sending any commands. Raises an FIUException for the first invalid or unsafe 
+        change, otherwise returns the changes with each state converted to an FIUState."""
+        changes = [(mod_id, channel, FIUState(state)) for mod_id, channel, state in changes]
+        for mod_id, channel, state in changes:
+            if not self.__valid_module(mod_id):
+                raise FIUException(5075)
+            if not self.__valid_channel(channel):
+                raise FIUException(5051)
+            if state not in STATE_COMMANDS:
+                raise FIUException(5011, channel, state.name)
+        #Check that every intermediate state of the batch is safe given the configuration of the FIU Bus
+        unsafe = self.__state_mgr.check_batch_transition(changes, self._sharedDMM)
+        if unsafe is not None:
+            raise FIUException(5010, unsafe[1], unsafe[2].name)
+        return changes
+
+    @synchronized
+    def compare_and_set(self, mod_id: int, channel: int, expected: FIUState, state: FIUState) -> bool:
+        """Sets the channel to state only if the state manager shows it in the expected state. 
+        The check and the change are atomic with respect to other threads using this FIU. 
+        Returns whether the channel was changed."""
+        if not self.__valid_module(mod_id):
+            raise FIUException(5075)
+        if not self.__valid_channel(channel):
+            raise FIUException(5051)
+        if self.__state_mgr.get_channel_state(mod_id, channel) != expected:
+            return False
+        self.apply([(mod_id, channel, state)])
+        return True
+
+    @synchronized
+    def _write_change(self, frame: bytes, mod_id: int, channel: int, state: FIUState) -> None:
+        """Writes a prebuilt frame for a change that has already been validated, and records the channel's new state.
+        If the outcome of the command is unknown, the module's state is read back from hardware."""
+        try:
+            self.__write_checked(frame)
+        except FIUException as e:
+            if e.retryable:
+                self.__resync([mod_id])
+            raise
+        self.__state_mgr.set_channel_state(mod_id, channel, state)
+
+    @synchronized
+    def _write_batch(self, frames: list, changes: list) -> None:
+        """Writes prebuilt frames, pipelined, that together make a list of (mod_id, channel, FIUState) changes, 
+        after validating the changes in order. Used to run plans that combine changes into 99 broadcast commands."""
+        changes = self.validate(changes)
+        self.__write_all_checked(frames, sorted({mod_id for mod_id, _, _ in changes}))
+        self.__state_mgr.set_batch_state(changes)
+
+    @synchronized
+    def bus_users(self) -> list:
+        """Returns the (mod_id, channel, FIUState) of every channel the state manager shows using the DMM or fault bus"""
+        return self.__state_mgr.bus_channels()
+
+    def transaction(self) -> "FIUTransaction":
+        """Returns a transaction that collects channel state changes and applies them as a single batch
+        when the with statement is exited without an exception"""
+        return FIUTransaction(self)
+
+    @synchronized
+    def relay_state(self, mod_id: int, cached: bool = None) -> list:
+        """Returns the FIUState of every channel on the provided FIU module. 
+        If cached (defaults to the cache settings) the state manager's copy is returned unless it is due 
+        to be re-queried, otherwise the state is read from the FIU and the state manager is updated."""
         if(self.__valid_module(mod_id)):
-            system_status = [] 
-            status = self.interface.write_cmd(f"S{mod_id}")
-            for i in range(24):
-                stat = status[i]
-                if   stat == 'C': system_status.append(FIUState.CONNECTED.name)
-                elif stat == 'D': system_status.append(FIUState.DISCONNECTED.name)
-                elif stat == 'V': system_status.append(FIUState.VOLT_MEASUREMENT.name)
-                elif stat == 'I': system_status.append(FIUState.CURR_MEASUREMENT.name)
-                elif stat == 'F': system_status.append(FIUState.FAULT_TO_GND.name)
-                else:             system_status.append(FIUState.RESET.name)
-            return system_status
+            if cached is None:
+                cached = self._cache.enabled
+            if cached and not self.__cache_expired(mod_id):
+                return self.__state_mgr.get_module_state(mod_id)
+            states = self.__read_relay_state(mod_id)
+            self.__state_mgr.load_module_state(mod_id, states)
+            return states
         else:
             raise FIUException(5075)
 
+    @synchronized
+    def reconcile(self, mod_ids: list = None) -> dict:
+        """Reads the relay state of each module (defaults to all modules) from the FIU and updates the 
+        state manager to match. Returns the channels whose state manager copy differed from hardware, 
+        as a list of (channel, expected FIUState, actual FIUState) tuples keyed by module ID."""
+        differences = dict()
+        for mod_id in (self.module_IDs if mod_ids is None else mod_ids):
+            if not self.__valid_module(mod_id):
+                raise FIUException(5075)
+            expected = self.__state_mgr.get_module_state(mod_id)
+            actual = self.__read_relay_state(mod_id)
+            self.__state_mgr.load_module_state(mod_id, actual)
+            differences[mod_id] = [(i + 1, exp, act) for i, (exp, act) in enumerate(zip(expected, actual)) if exp != act]
+        return differences
+
     # Deprecated from LabVIEW Driver
     # def relay_contact_cycle_count(self, mod_id: int, channel: int):
     #     """Returns the number of cycles the relays on the specified channel have experienced."""
@@ -192,25 +374,110 @@ class FIU(object):
 
     def software_version(self, mod_id: int) -> str:
         """Returns the current version of the software running on the FIU."""
-        #valid module check is disabled in labVIEW driver... so let's just send it
-        return self.interface.write_cmd(f"H{mod_id}")
+        if(self.__valid_module(mod_id)):
+            return self.__write_checked(QUERY_FRAMES["H"][mod_id]).decode('utf-8')
+        else:
+            raise FIUException(5075)
     
     def interlock_state(self, mod_id: int) -> bool:
         """Returns the state of the 24V interlock input on the FIU (Active or Inactive)."""
         if(self.__valid_module(mod_id)):
-            int_state = self.interface.write_cmd(f"L{mod_id}")
-            return False if int_state == '0' else '1'
+            int_state = self.__write_checked(QUERY_FRAMES["L"][mod_id])
+            return int_state != b'0'
         else:
             raise FIUException(5075)
 
     def interlock_override(self, mod_id: int, enable_disable: bool) -> None:
         """Sets the 24V interlock input on the FIU to active (enable) or inactive (disable)."""
         if(self.__valid_module(mod_id)):
-            cmd = f"O{mod_id}{'1' if enable_disable else '0'}"
-            self.interface.write_cmd(cmd)
+            self.__write_checked(OVERRIDE_FRAMES[mod_id][1 if enable_disable else 0])
         else:
             raise FIUException(5075)
 
+    @synchronized
+    def snapshot(self) -> SystemSnapshot:
+        """Reads the relay state, interlock state, and software version of every module in one pipelined pass,
+        updating the state manager with the relay states. Returns an immutable SystemSnapshot."""
+        #group the queries by type so consecutive commands address different modules and can be pipelined
+        frames = [QUERY_FRAMES[cmd_char][mod_id] for cmd_char in "SLH" for mod_id in self.module_IDs]
+        replies = self.__write_all_checked(frames)
+        count = len(self.module_IDs)
+        relay_states = bytearray()
+        for mod_id, status in zip(self.module_IDs, replies[:count]):
+            states = [RELAY_STATE_TABLE[stat] for stat in status[:CHANNEL_COUNT]]
+            states += [FIUState.RESET] * (CHANNEL_COUNT - len(states))
+            self.__state_mgr.load_module_state(mod_id, states)
+            relay_states += bytes(states)
+        return SystemSnapshot(
+            module_IDs = tuple(self.module_IDs),
+            relay_states = bytes(relay_states),
+            interlocks = tuple(ret != b'0' for ret in replies[count:2*count]),
+            versions = tuple(ret.decode('utf-8') for ret in replies[2*count:]),
+            timestamp = time(),
+        )
+
+    def __write_checked(self, frame: bytes) -> bytes:
+        """Writes a command frame to the FIU and returns the response data, retrying timeouts and 
+        checksum errors according to the retry policy"""
+        return self.__retry(self.interface.write_frame, frame)
+
+    def __write_all_checked(self, frames: list, mod_ids: list = ()) -> list:
+        """Writes a list of command frames to the FIU pipelined and returns the response data for each, retrying 
+        the whole list according to the retry policy. If the list still fails, the state of mod_ids is read back."""
+        try:
+            return self.__retry(self.interface.write_frames, frames)
+        except FIUException as e:
+            if e.retryable:
+                self.__resync(mod_ids)
+            raise
+
+    def __retry(self, write, frames):
+        """Calls write with the frames, sending them again while they time out or fail checksum validation
+        and the retry policy allows"""
+        attempt = 0
+        while True:
+            try:
+                ret = write(frames)
+            except FIUException as e:
+                policy = self._retry
+                if not e.retryable or attempt >= policy.retries or self._retries_used >= policy.budget:
+                    raise
+                attempt += 1
+                self._retries_used += 1
+                sleep(policy.delay)
+                continue
+            if attempt == 0:
+                self._retries_used = 0
+            return ret
+
+    def __resync(self, mod_ids) -> None:
+        """Reads the relay state of each module back into the state manager after a state change with an
+        unknown outcome. Modules that cannot be read keep their last known state."""
+        if not self._retry.resync:
+            return
+        for mod_id in mod_ids:
+            try:
+                self.__state_mgr.load_module_state(mod_id, self.__read_relay_state(mod_id))
+            except FIUException:
+                pass
+
+    def __read_relay_state(self, mod_id: int) -> list:
+        """Queries the FIU for the relay state of every channel on the module. 
+        Channels missing from a short reply are in the RESET (unknown) state."""
+        status = self.__write_checked(QUERY_FRAMES["S"][mod_id])
+        states = [RELAY_STATE_TABLE[stat] for stat in status[:CHANNEL_COUNT]]
+        states += [FIUState.RESET] * (CHANNEL_COUNT - len(states))
+        return states
+
+    def __cache_expired(self, mod_id: int) -> bool:
+        """Checks whether the cached state of the module must be re-queried from the FIU"""
+        age = self.__state_mgr.state_age(mod_id)
+        if age is None:
+            return True
+        if self._cache.max_age is not None and age > self._cache.max_age:
+            return True
+        return self._cache.max_writes is not None and self.__state_mgr.writes_since_sync(mod_id) >= self._cache.max_writes
+
     def __valid_module(self, mod_id: int) -> bool:
         """Ensures provided Module ID exists in the list of FIU Modules initialized on the system"""
         return True if mod_id in self.module_IDs else False 
@@ -222,6 +489,32 @@ class FIU(object):
     def __check_transition(self, new_state, mod_id, channel) -> bool:
         """Asks the state manager to check if it is safe to transition to the new state, given the configuration of the FIU Bus"""
         if self._sharedDMM:
-            return self.__state_mgr.check_shared_DMM_transition(new_state) 
+            return self.__state_mgr.check_shared_DMM_transition(new_state, mod_id, channel)
         else: 
-            return self.__state_mgr.check_transition(mod_id, channel, new_state)
\ No newline at end of file
+            return self.__state_mgr.check_transition(mod_id, channel, new_state)
+
+
+class FIUTransaction(object):
+    """Collects channel state changes to be applied to the FIU as a single batch.
+    Changes are validated and sent when the with statement is exited, or when apply is called."""
+
+    def __init__(self, fiu: FIU) -> None:
+        self.fiu = fiu
+        self.changes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.apply()
+
+    def set_state(self, mod_id: int, channel: int, state: FIUState) -> "FIUTransaction":
+        """Adds a channel state change to the transaction"""
+        self.changes.append((mod_id, channel, state))
+        return self
+
+    def apply(self) -> None:
+        """Applies all collected changes to the FIU and clears the transaction"""
+        changes, self.changes = self.changes, []
+        self.fiu.apply(changes)
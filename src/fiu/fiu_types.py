@@ -1,18 +1,29 @@
-from dataclasses import dataclass
-import serial
+from dataclasses import dataclass, field
+from time import monotonic
 from enum import IntEnum
 
 class FIUException(BaseException):
+    #whether the command can be sent again, because its outcome was lost rather than rejected by the FIU
+    retryable = False
+
     def __init__(self, code: int, *args):
         self.code = code
-        if code ==   5002: 
+        if code ==   5001:
+            self.message = f"Timed out waiting for response to cmd {args[0]}\n{'No Data Received' if not args[1] else f'Incomplete Frame: {args[1]}'}"
+        elif code == 5002: 
             self.message = f"FIU Module\nInvalid Response to cmd {args[0]}\n{'Device Not Found' if args[1] is None else args[1]}"
         elif code == 5003: 
             self.message = f"{args[0]}\nSource CMD: {args[1]}"
         elif code == 5004: 
             self.message = args[0]
+        elif code == 5005:
+            self.message = f"Response to cmd {args[0]} failed checksum validation\nFrame: {args[1]}"
         elif code == 5010: 
             self.message = f"Unable to set channel {args[0]} state to {args[1]}. There is another channel currently using the DMM or Fault in this module."
+        elif code == 5011:
+            self.message = f"Unable to set channel {args[0]} state to {args[1]}. The state cannot be commanded."
+        elif code == 5012:
+            self.message = f"Unable to set channel {args[0]} state to {args[1]}. Module {args[2]} channel {args[3]} on FIU {args[4]} is currently using the shared DMM or Fault."
         elif code == 5051: 
             self.message = "The channel input is out of range"
         elif code == 5075: 
@@ -21,6 +32,33 @@ class FIUException(BaseException):
     def __str__(self):
         return f"FIU Module Error\nCode: {self.code}\nDetails: {self.message}"
 
+class FIUTimeoutError(FIUException):
+    """No complete response frame arrived in time (5001)"""
+    retryable = True
+
+    def __init__(self, cmd: str, partial: bytes):
+        super().__init__(5001, cmd, partial)
+        #bytes of the incomplete response received before the timeout
+        self.received = partial
+
+class FIUChecksumError(FIUException):
+    """A response frame failed checksum validation (5005)"""
+    retryable = True
+
+    def __init__(self, cmd: str, frame: bytes):
+        super().__init__(5005, cmd, frame)
+        self.received = frame
+
+class FIUResponseError(FIUException):
+    """A response frame had an invalid return code (5002)"""
+    def __init__(self, cmd: str, frame: bytes):
+        super().__init__(5002, cmd, frame)
+
+class FIUCommandError(FIUException):
+    """The FIU module rejected the command with an error message (5003) or error data (5004)"""
+    def __init__(self, code: int, *args):
+        super().__init__(code, *args)
+
 
 @dataclass
 class DefaultPortSettings:
@@ -28,8 +66,39 @@ class DefaultPortSettings:
     for RS485 communication with the Fault Insertion Unit"""
     baud_rate: int = 115200
     byte_size: int = 8
-    parity: serial.PARITY_NONE = 'N'
-    stop_bits: serial.STOPBITS_ONE = 1
+    #pyserial PARITY_NONE and STOPBITS_ONE, spelled out so the state model loads without pyserial
+    parity: str = 'N'
+    stop_bits: int = 1
+    #seconds allowed for a complete response frame to arrive after a command is written
+    response_timeout: float = 0.5
+    #seconds allowed between consecutive bytes of a response frame
+    inter_byte_timeout: float = 0.02
+    #maximum number of commands to different modules outstanding on the bus at once. Replies are only 
+    #collision free with depths above 1 when the adapter and modules tolerate back-to-back traffic
+    pipeline_depth: int = 1
+
+@dataclass
+class CacheSettings:
+    """Data class containing the relay_state cache configuration. 
+    When enabled, relay_state answers from the driver's state manager until the module's state is older than 
+    max_age seconds, or max_writes commands have changed it since it was last read from hardware. 
+    A limit of None is never reached."""
+    enabled: bool = False
+    max_age: float = None
+    max_writes: int = None
+
+@dataclass
+class RetryPolicy:
+    """Data class containing the command retry configuration. 
+    FIU commands are idempotent, so a command that times out or receives a corrupted response is sent again, 
+    up to retries more times. Retries are only made while fewer than budget retries have been made since a 
+    command last succeeded on its first attempt, bounding the time spent retrying on a dead bus. 
+    When resync is enabled and a state change still fails, the module's state is read back with an S query."""
+    retries: int = 2
+    #seconds to wait before retrying, so a late response arrives and is discarded
+    delay: float = 0.005
+    budget: int = 10
+    resync: bool = True
 
 @dataclass
 class RelayCount:
@@ -48,81 +117,210 @@ class FIUState(IntEnum):
     FAULT_TO_GND = 5
 
 
+#Command characters used to set a channel to each commandable state
+STATE_COMMANDS = {
+    FIUState.CONNECTED:        "C",
+    FIUState.DISCONNECTED:     "D",
+    FIUState.VOLT_MEASUREMENT: "V",
+    FIUState.CURR_MEASUREMENT: "I",
+    FIUState.FAULT_TO_GND:     "F",
+}
+
+
+#Number of RS-485 module IDs and channels per module supported by the FIU
+MODULE_COUNT = 8
+CHANNEL_COUNT = 24
+
+#Lookup of the FIUState for each relay state character returned by the S command
+RELAY_STATE_CODES = {
+    "C": FIUState.CONNECTED,
+    "D": FIUState.DISCONNECTED,
+    "V": FIUState.VOLT_MEASUREMENT,
+    "I": FIUState.CURR_MEASUREMENT,
+    "F": FIUState.FAULT_TO_GND,
+}
+
+#Lookup of the FIUState for each relay state byte returned by the S command, indexed by byte value
+RELAY_STATE_TABLE = tuple(RELAY_STATE_CODES.get(chr(code), FIUState.RESET) for code in range(256))
+
+#Lookup of whether each FIUState connects the channel to the shared DMM/fault bus
+BUS_STATES = bytes([0, 0, 0, 1, 1, 1])
+
+
 class StateManager(object):
     """Class used to manage safe state transition between channel fault states.
     An error will occur when trying to transition to an unsafe state, before ever reaching the FIU. 
-    This prevents unintentional damage to the system."""
+    This prevents unintentional damage to the system.
+    Channel states are stored in a MODULE_COUNT x CHANNEL_COUNT byte array indexed by module ID, along with 
+    running counts of the channels using the DMM/fault bus in each module and in the system, so safety 
+    checks are constant time lookups."""
     def __init__(self, box_ids: list):
         self._boxIDs = box_ids
-        self.registry = dict()
-
-    def __get_all_state(self) -> list:
-        """Private accessor to return the channel fault state list for all initialized Module IDs"""
-        all_states = list[list[FIUState]]
-        for id in self._boxIDs: 
-            all_states.add(self.registry["%d" % id])
-        return all_states    
-    
-    def __get_channel_state(self, module: int, channel: int) -> FIUState:
-        """Private accessor for the fault state of a specific channel on the provided Module"""
-        states = self.registry["%d" % module]
-        chan_state = states[channel-1]
-        return chan_state
+        self._states = bytearray(MODULE_COUNT * CHANNEL_COUNT)
+        self._bus_count = [0] * MODULE_COUNT
+        self._system_bus_count = 0
+        #time each module's state was last read from hardware, and writes to the module since then
+        self._synced_at = [None] * MODULE_COUNT
+        self._writes = [0] * MODULE_COUNT
+
+    @property
+    def registry(self) -> dict:
+        """Copy of the channel fault states for all initialized Module IDs, keyed by Module ID"""
+        return {id: self.get_module_state(id) for id in self._boxIDs}
 
-    def __get_module_state(self, module: int) -> list:
-        """Private accessor for the fault states of the provided Module"""
-        return self.registry["%d" % module]
-        
+    def get_channel_state(self, module: int, channel: int) -> FIUState:
+        """Accessor for the fault state of a specific channel on the provided Module"""
+        return FIUState(self._states[module * CHANNEL_COUNT + channel - 1])
+
+    def get_module_state(self, module: int) -> list:
+        """Accessor for the fault states of the provided Module"""
+        start = module * CHANNEL_COUNT
+        return [FIUState(state) for state in self._states[start:start + CHANNEL_COUNT]]
 
     def set_module_state(self, module: int, state: FIUState) -> None:
-        """Set the the fault state for all channels in the designated module, creating/replacing 
-        the registry entry for the module ID"""
-        new_states = [state]*24
-        self.registry["%d" % module] = new_states
+        """Set the the fault state for all channels in the designated module"""
+        start = module * CHANNEL_COUNT
+        self._states[start:start + CHANNEL_COUNT] = bytes((state,)) * CHANNEL_COUNT
+        count = CHANNEL_COUNT * BUS_STATES[state]
+        self._system_bus_count += count - self._bus_count[module]
+        self._bus_count[module] = count
+        self._writes[module] += 1
     
     def set_channel_state(self, module: int, channel: int, state: FIUState) -> None:
-        """Set the fault state for a specific channel in the provided module's registry entry,
-        replacing the registry value with the updated list of channel fault states"""
-        key = "%d" % module
-        mod_states = self.registry[key]
-        mod_states[channel-1] = state
-        self.registry[key] = mod_states
+        """Set the fault state for a specific channel in the provided module"""
+        index = module * CHANNEL_COUNT + channel - 1
+        delta = BUS_STATES[state] - BUS_STATES[self._states[index]]
+        self._states[index] = state
+        self._bus_count[module] += delta
+        self._system_bus_count += delta
+        self._writes[module] += 1
+
+    def load_module_state(self, module: int, states: list) -> None:
+        """Replace the fault states of the provided Module with the states read from hardware,
+        marking the module's state as synchronized"""
+        if len(states) != CHANNEL_COUNT:
+            raise ValueError(f"Expected {CHANNEL_COUNT} channel states for module {module}, got {len(states)}")
+        start = module * CHANNEL_COUNT
+        self._states[start:start + CHANNEL_COUNT] = bytes(states)
+        count = sum(BUS_STATES[state] for state in states)
+        self._system_bus_count += count - self._bus_count[module]
+        self._bus_count[module] = count
+        self._synced_at[module] = monotonic()
+        self._writes[module] = 0
+
+    def state_age(self, module: int) -> float:
+        """Seconds since the provided Module's state was last read from hardware, None if it never has been"""
+        synced_at = self._synced_at[module]
+        return None if synced_at is None else monotonic() - synced_at
+
+    def writes_since_sync(self, module: int) -> int:
+        """Number of state changes made to the provided Module since its state was last read from hardware"""
+        return self._writes[module]
 
     def set_all_state(self, all_modules: list, state: FIUState) -> None:
         """Set all channel states for a given list of FIU Module IDs"""
         for mod in all_modules:
             self.set_module_state(mod, state)
-        
+
+    def set_batch_state(self, changes: list) -> None:
+        """Set the fault state for every (module, channel, state) change in the batch, in order"""
+        for mod_id, channel, state in changes:
+            self.set_channel_state(mod_id, channel, state)
+
+    def bus_channels(self) -> list:
+        """Returns the (module, channel, state) of every channel currently using the DMM/fault bus"""
+        users = []
+        for mod_id in self._boxIDs:
+            if self._bus_count[mod_id]:
+                start = mod_id * CHANNEL_COUNT
+                users += [(mod_id, i + 1, FIUState(state)) for i, state in 
+                          enumerate(self._states[start:start + CHANNEL_COUNT]) if BUS_STATES[state]]
+        return users
+
+    def check_batch_transition(self, changes: list, shared_dmm: bool = False):
+        """Validates a batch of (module, channel, state) changes applied in order, in a single pass 
+        that tracks the pending channel states and bus counts of the batch. Returns the first change 
+        that would result in unsafe conditions, or None if the entire batch is safe to apply"""
+        pending = {}
+        bus_count = list(self._bus_count)
+        system_bus_count = self._system_bus_count
+        for change in changes:
+            mod_id, channel, next_state = change
+            index = mod_id * CHANNEL_COUNT + channel - 1
+            current = BUS_STATES[pending.get(index, self._states[index])]
+            if BUS_STATES[next_state]:
+                others = (system_bus_count if shared_dmm else bus_count[mod_id]) - current
+                if others:
+                    return change
+            delta = BUS_STATES[next_state] - current
+            bus_count[mod_id] += delta
+            system_bus_count += delta
+            pending[index] = next_state
+        return None
+
     def check_transition(self, mod_id: int, channel: int, next_state: FIUState) -> bool:
         """Validates that transitioning a channel to next_state will result in safe conditions for 
         the designated FIU module"""
-        chan = channel - 1
-        module_states = self.__get_module_state(mod_id)
-        if(FIUState.VOLT_MEASUREMENT <= next_state <= FIUState.FAULT_TO_GND):
-            check = []
-            i = 0
-            for state in module_states:
-                if(i is not chan):
-                    check.append(state in range(FIUState.VOLT_MEASUREMENT, FIUState.FAULT_TO_GND + 1))
-            if any(check):
-                return False
-            else:
-                return True
-        else:
-            return True
+        if BUS_STATES[next_state]:
+            #no channel other than the one being changed may be using the bus
+            return self._bus_count[mod_id] - BUS_STATES[self._states[mod_id * CHANNEL_COUNT + channel - 1]] == 0
+        return True
     
-    def check_shared_DMM_transition(self, next_state: FIUState) -> bool:
-        """Validates transition to the next state is valid when the FIU is in shared DMM mode"""
-        all_mod_states = self.__get_all_state()
-        if(FIUState.VOLT_MEASUREMENT <= next_state <= FIUState.FAULT_TO_GND):
-            check = []
-            for mod in all_mod_states:
-                for state in mod:
-                    check.append(state in range(FIUState.VOLT_MEASUREMENT, FIUState.FAULT_TO_GND + 1))
-            #
-            if any(check): 
-                return False
-            else:
-                return True
-        else:
-            return True
\ No newline at end of file
+    def check_shared_DMM_transition(self, next_state: FIUState, mod_id: int = None, channel: int = None) -> bool:
+        """Validates transition to the next state is valid when the FIU is in shared DMM mode.
+        If a module and channel are provided, that channel's own state is excluded from the check."""
+        if BUS_STATES[next_state]:
+            count = self._system_bus_count
+            if mod_id is not None:
+                count -= BUS_STATES[self._states[mod_id * CHANNEL_COUNT + channel - 1]]
+            return count == 0
+        return True
+
+
+@dataclass(frozen=True)
+class SystemSnapshot:
+    """Immutable record of the relay, interlock, and software version state of every module in an FIU system.
+    relay_states holds one FIUState value per channel, CHANNEL_COUNT bytes per module in module_IDs order, 
+    and may be viewed as a uint8 array, e.g. numpy.frombuffer(snapshot.relay_states, numpy.uint8).reshape(-1, 24)"""
+    module_IDs: tuple
+    relay_states: bytes
+    interlocks: tuple
+    versions: tuple
+    timestamp: float = field(default=0.0, compare=False)
+
+    def module_state(self, mod_id: int) -> list:
+        """Returns the FIUState of every channel on the provided module"""
+        start = self.module_IDs.index(mod_id) * CHANNEL_COUNT
+        return [FIUState(state) for state in self.relay_states[start:start + CHANNEL_COUNT]]
+
+    def interlock(self, mod_id: int) -> bool:
+        """Returns the interlock state of the provided module"""
+        return self.interlocks[self.module_IDs.index(mod_id)]
+
+    def version(self, mod_id: int) -> str:
+        """Returns the software version of the provided module"""
+        return self.versions[self.module_IDs.index(mod_id)]
+
+    def diff(self, other: "SystemSnapshot") -> list:
+        """Returns the differences from this snapshot to a later one, as (mod_id, field, before, after) tuples 
+        where field is the channel number (1-24) for relay states, "interlock", or "version". 
+        Modules present in only one of the snapshots are reported with None for the missing state."""
+        if self == other:
+            return []
+        changes = []
+        for mod_id in sorted(set(self.module_IDs) | set(other.module_IDs)):
+            if mod_id not in other.module_IDs or mod_id not in self.module_IDs:
+                before = self.module_state(mod_id) if mod_id in self.module_IDs else [None] * CHANNEL_COUNT
+                after = other.module_state(mod_id) if mod_id in other.module_IDs else [None] * CHANNEL_COUNT
+                changes += [(mod_id, i + 1, b, a) for i, (b, a) in enumerate(zip(before, after))]
+                continue
+            start, other_start = self.module_IDs.index(mod_id) * CHANNEL_COUNT, other.module_IDs.index(mod_id) * CHANNEL_COUNT
+            before = self.relay_states[start:start + CHANNEL_COUNT]
+            after = other.relay_states[other_start:other_start + CHANNEL_COUNT]
+            if before != after:
+                changes += [(mod_id, i + 1, FIUState(b), FIUState(a)) for i, (b, a) in enumerate(zip(before, after)) if b != a]
+            if self.interlock(mod_id) != other.interlock(mod_id):
+                changes.append((mod_id, "interlock", self.interlock(mod_id), other.interlock(mod_id)))
+            if self.version(mod_id) != other.version(mod_id):
+                changes.append((mod_id, "version", self.version(mod_id), other.version(mod_id)))
+        return changes
@@ -0,0 +1,34 @@
+from .fiu_types import *
+from .codec import add_CRC, encode_command
+
+#Ready to send frames for the channel state commands, indexed [state][module ID][channel].
+#Channel 99 addresses every channel on the module.
+CHANNEL_FRAMES = {
+    state: [{channel: add_CRC(f"{cmd_char}{mod_id}{channel:02d}".encode('ascii')) 
+             for channel in list(range(1, CHANNEL_COUNT + 1)) + [99]}
+            for mod_id in range(MODULE_COUNT)]
+    for state, cmd_char in STATE_COMMANDS.items()
+}
+
+#Ready to send frames for the module queries, indexed [command character][module ID]:
+#S (relay state), H (software version), and L (interlock state)
+QUERY_FRAMES = {
+    cmd_char: [add_CRC(f"{cmd_char}{mod_id}".encode('ascii')) for mod_id in range(MODULE_COUNT)]
+    for cmd_char in "SHL"
+}
+
+#Ready to send frames for the interlock override command, indexed [module ID][enable]
+OVERRIDE_FRAMES = [
+    [add_CRC(f"O{mod_id}{enable}".encode('ascii')) for enable in range(2)]
+    for mod_id in range(MODULE_COUNT)
+]
+
+#Frames for any other command string, filled as they are first used
+_frame_cache = dict()
+
+def command_frame(msg: str) -> bytes:
+    """Returns the ready to send frame for a command string"""
+    frame = _frame_cache.get(msg)
+    if frame is None:
+        frame = _frame_cache[msg] = bytes(encode_command(bytearray(), msg))
+    return frame
@@ -1,32 +1,96 @@
-from time import sleep
-from serial import Serial
+import threading
+from time import monotonic
 from .fiu_types import *
+from .frames import command_frame
+from .codec import *
+from .metrics import CommandMetrics, CommandRecord
+from .journal import CommandJournal, JOURNAL_SENT, JOURNAL_RECEIVED, JOURNAL_TIMEOUT
 
 class CommInterface(object):
     """Abstract communication interface class for future comm protocol implementations"""
+    #CommandMetrics collecting per-command statistics, None when metrics are disabled
+    metrics = None
+    #CommandJournal recording every frame sent and received, None when journaling is disabled
+    journal = None
+
     def __init__(self, resource: str):
         self.resource = resource
 
+    def enable_metrics(self, hook=None) -> CommandMetrics:
+        """Starts collecting per-command metrics, calling hook with the CommandRecord of every command if provided"""
+        self.metrics = CommandMetrics(hook)
+        return self.metrics
+
+    def disable_metrics(self) -> None:
+        """Stops collecting per-command metrics"""
+        self.metrics = None
+
+    def metrics_snapshot(self) -> dict:
+        """Returns a copy of the collected metrics, or None if metrics are disabled"""
+        return None if self.metrics is None else self.metrics.snapshot()
+
+    def enable_journal(self, path: str) -> CommandJournal:
+        """Starts recording every frame sent and received to the command journal at path, appending if it exists"""
+        journal = CommandJournal(path)
+        #detach the previous journal before closing it, so it is never used once closed
+        previous, self.journal = self.journal, journal
+        if previous is not None:
+            previous.close()
+        return journal
+
+    def disable_journal(self) -> None:
+        """Stops recording frames and closes the command journal"""
+        journal, self.journal = self.journal, None
+        if journal is not None:
+            journal.close()
+
     def open(self):
         pass
 
     def close(self):
         pass
+
+    def write_frame(self, frame: bytes, timeout: float = None) -> bytes:
+        pass
+
+    def write_frames(self, frames: list, timeout: float = None) -> list:
+        """Write a list of command frames out to the device in order, returning the response data for each"""
+        return [self.write_frame(frame, timeout) for frame in frames]
+
+    def write_cmd(self, msg: str, timeout: float = None) -> str:
+        """Write a message out to the device and return the parsed return data"""
+        return self.__decode(self.write_frame(command_frame(msg), timeout))
+
+    def write_cmds(self, msgs: list, timeout: float = None) -> list:
+        """Write a list of messages out to the device in order, returning the parsed return data for each"""
+        return [self.__decode(ret) for ret in self.write_frames([command_frame(msg) for msg in msgs], timeout)]
+
+    def __decode(self, ret: bytes) -> str:
+        """Decodes response data to a string"""
+        return ret.decode('utf-8')
     
 class RS485(CommInterface):
     def __init__(self, port: str, port_settings: DefaultPortSettings = DefaultPortSettings()) -> None:
         self.resource = port
         self._port_cfg = port_settings
+        #splits received bytes into response frames, holding bytes received after the last complete frame
+        self._decoder = FrameDecoder()
+        #time the first byte of the response being read arrived, when metrics are enabled
+        self._first_byte_at = None
+        #serializes commands from multiple threads so frames and responses are never interleaved
+        self.lock = threading.RLock()
 
     def open(self) -> None:
         """Opens an RS-485 connection to the FIU."""
         #Set port settings for the interface class from custom dataclass with port settings 
-        #according to FIU communication specification
+        #according to FIU communication specification. pyserial is only imported once a port is opened
+        from serial import Serial
         self.serial = Serial()
         self.serial.baudrate = self._port_cfg.baud_rate
         self.serial.bytesize = self._port_cfg.byte_size
         self.serial.parity   = self._port_cfg.parity
         self.serial.stopbits = self._port_cfg.stop_bits
+        self.serial.timeout  = self._port_cfg.inter_byte_timeout
         #Configure rs485 mode with default settings
         #self.serial.rs485_mode = rs485.RS485Settings
         #open the port connection to begin communication session
@@ -37,48 +101,180 @@ class RS485(CommInterface):
         """Closes a connection to the FIU."""
         #connect all channels before closing
         self.serial.close()
-    
-    
-    def __add_CRC(self, msg: str) -> str:
-        """Add checksum code and newline termination character to the message"""
-        #CRC is calculated from the sum of the message's u8 byte array modulo
-        encoded_msg_sum = sum(bytes(msg, 'utf-8'))
-        #Take only the hex value characters from the hex string  
-        CRC = hex(encoded_msg_sum % 256)[2:].upper()
-        #add end line constant for the termination character(s)
-        return msg + CRC + '\r'
-
-    def write_cmd(self, msg: str) -> str:
-        """Write a message out to the serial device and return the parsed return data"""
-        #clear the input and output buffers on the port
+
+    def write_frame(self, frame: bytes, timeout: float = None) -> bytes:
+        """Write a ready to send command frame out to the serial device and return the response data.
+        Returns as soon as a complete, CRC-valid response frame is received. The response must 
+        arrive within timeout seconds (defaults to the port settings response_timeout)."""
+        if timeout is None:
+            timeout = self._port_cfg.response_timeout
+        with self.lock:
+            #clear the input and output buffers on the port
+            self.reset_buffers()
+            sent_at = self.send(frame)
+            #wait for the terminated response frame
+            return self.receive(frame, monotonic() + timeout, sent_at)
+
+    def write_frames(self, frames: list, timeout: float = None) -> list:
+        """Write a list of command frames out to the serial device and return the response data for each.
+        Commands to different modules are pipelined up to the port settings pipeline_depth."""
+        with self.lock:
+            queue = CommandQueue(self, self._port_cfg.pipeline_depth, timeout)
+            for frame in frames:
+                queue.submit(frame)
+            return queue.drain()
+
+    def enable_journal(self, path: str) -> CommandJournal:
+        """Starts recording every frame sent and received to the command journal at path, once no command is in flight"""
+        with self.lock:
+            return super().enable_journal(path)
+
+    def disable_journal(self) -> None:
+        """Stops recording frames and closes the command journal, once no command is in flight"""
+        with self.lock:
+            super().disable_journal()
+
+    def reset_buffers(self) -> None:
+        """Clears the input and output buffers on the port, discarding any partially received frame"""
         self.serial.reset_input_buffer()
         self.serial.reset_output_buffer()
-        #add checksum and termination to the message, then write command out to device 
-        msg = self.__add_CRC(msg)
-        self.serial.write(msg.encode('utf-8'))
-        #wait 100 ms for response
-        sleep(0.1)
-        ret_msg = self.serial.read(self.serial.in_waiting).decode('utf-8')
-        return self.__check_return_msg(msg, ret_msg)
-
-    def __check_return_msg(self, sent_cmd: str, readbuff: str) -> str:
-        """Parses the returned message buffer based on the return code"""
-        return_msg = readbuff[0]
-        if return_msg == '0':
-            #Success - No Data
-            return ""
-        elif return_msg == '1':
-            #Success - Data
-            #Remove Return Code (1), CRC(2), and CR (1) characters
-            return readbuff[1:1+(len(readbuff)-4)]
-        elif return_msg == '2':
-            #Error msg
-            return FIUException(5003, [readbuff, sent_cmd])
-        elif return_msg == '3':
-            #Error Data
+        self._decoder.clear()
+
+    def send(self, frame: bytes):
+        """Writes a ready to send command frame out to the serial device. 
+        When metrics are enabled, returns the times the write started and finished."""
+        if self.journal is not None:
+            self.journal.append(JOURNAL_SENT, frame)
+        if self.metrics is None:
+            self.serial.write(frame)
+            return None
+        start = monotonic()
+        self.serial.write(frame)
+        return start, monotonic()
+
+    def receive(self, sent_frame: bytes, deadline: float, sent_at=None) -> bytes:
+        """Reads the next response frame from the serial device and returns its response data.
+        sent_at is the value returned by send for the command, used to record metrics."""
+        if sent_at is None or self.metrics is None:
+            return self.__check_return_msg(sent_frame, self.__read_frame(sent_frame, deadline))
+        start, written = sent_at
+        record = CommandRecord(chr(sent_frame[0]), chr(sent_frame[1]), written - start, bytes_sent=len(sent_frame))
+        #a response already buffered from a pipelined read arrived no later than now
+        self._first_byte_at = monotonic() if len(self._decoder) else None
+        try:
+            frame = self.__read_frame(sent_frame, deadline)
+        except FIUException as e:
+            record.error = e.code
+            #corrupted and incomplete responses still took their bytes on the wire
+            record.bytes_received = len(getattr(e, "received", None) or b"")
+            raise
+        else:
+            record.frame = monotonic() - start
+            record.bytes_received = len(frame)
+            record.return_code = chr(frame[0])
+            return self.__check_return_msg(sent_frame, frame)
+        finally:
+            if self._first_byte_at is not None:
+                record.first_byte = max(self._first_byte_at - start, 0.0)
+            self.metrics.record(record)
+
+    def __read_frame(self, sent_frame: bytes, deadline: float) -> bytes:
+        """Reads from the port until a carriage return terminated frame is received and its CRC is verified.
+        Raises an FIUException if the deadline passes, or the inter-byte timeout expires on a partial frame."""
+        decoder = self._decoder
+        while True:
+            frame = decoder.next_frame()
+            if frame is not None:
+                if self.journal is not None:
+                    self.journal.append(JOURNAL_RECEIVED, frame)
+                if not verify_response(frame):
+                    raise FIUChecksumError(sent_frame.decode('utf-8'), frame)
+                return frame
+            if monotonic() > deadline:
+                if self.journal is not None:
+                    self.journal.append(JOURNAL_TIMEOUT, decoder.pending())
+                raise FIUTimeoutError(sent_frame.decode('utf-8'), decoder.pending())
+            #port read timeout is the inter-byte timeout, a read returns as soon as any bytes are available
+            chunk = self.serial.read(max(1, self.serial.in_waiting))
+            if chunk and self.metrics is not None and self._first_byte_at is None:
+                self._first_byte_at = monotonic()
+            if not chunk and len(decoder):
+                #the device stopped sending part way through a frame
+                if self.journal is not None:
+                    self.journal.append(JOURNAL_TIMEOUT, decoder.pending())
+                raise FIUTimeoutError(sent_frame.decode('utf-8'), decoder.pending())
+            decoder.feed(chunk)
+
+    def __check_return_msg(self, sent_frame: bytes, readbuff: bytes) -> bytes:
+        """Parses the returned message buffer based on the return code, raising the error returned by the FIU"""
+        if not readbuff:
+            raise FIUResponseError(sent_frame.decode('utf-8'), None)
+        return_code = readbuff[0]
+        if return_code == RETURN_SUCCESS:
+            return b""
+        elif return_code == RETURN_DATA:
+            return bytes(response_data(readbuff))
+        elif return_code == RETURN_ERROR:
+            raise FIUCommandError(5003, str(response_data(readbuff), 'utf-8'), sent_frame.decode('utf-8'))
+        elif return_code == RETURN_ERROR_DATA:
             #Error returned when attempting to short multiple channels to the bus
-            #Remove Return Code (1), CRC(2), and CR (1) characters
-            return FIUException(5004, readbuff[1:1+(len(readbuff)-4)])
+            raise FIUCommandError(5004, str(response_data(readbuff), 'utf-8'))
         else:
             #Invalid Response to CMD
-            return FIUException(5002, [sent_cmd, readbuff])
\ No newline at end of file
+            raise FIUResponseError(sent_frame.decode('utf-8'), readbuff)
+
+
+class CommandQueue(object):
+    """Pipelines commands to the FIU modules sharing an RS-485 bus.
+    Up to depth commands may be outstanding on the bus at once, and replies are matched to commands 
+    in the order they were sent. A command is not sent to a module while a previous command to the same 
+    module is outstanding, so ordering is kept per module. When the queue is full, submit reads replies 
+    until there is room for the next command. A command rejected by its module does not stop the other 
+    replies being read, and the first such error is raised by drain."""
+
+    def __init__(self, interface: RS485, depth: int = 1, timeout: float = None) -> None:
+        if depth < 1:
+            raise ValueError("Command queue depth must be at least 1")
+        self.interface = interface
+        self.depth = depth
+        self.timeout = interface._port_cfg.response_timeout if timeout is None else timeout
+        #(sent frame, module address, response deadline, send times) in the order sent
+        self._outstanding = []
+        self._results = []
+        self._error = None
+
+    def submit(self, frame: bytes) -> None:
+        """Sends a command frame once there is room in the queue and no command to the same module is outstanding"""
+        module = frame[1]
+        while len(self._outstanding) >= self.depth or any(entry[1] == module for entry in self._outstanding):
+            self.__receive_next()
+        if not self._outstanding:
+            self.interface.reset_buffers()
+        sent_at = self.interface.send(frame)
+        self._outstanding.append((frame, module, monotonic() + self.timeout, sent_at))
+
+    def drain(self) -> list:
+        """Waits for every outstanding reply, returning the response data of all submitted commands in order"""
+        while self._outstanding:
+            self.__receive_next()
+        results, self._results = self._results, []
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+        return results
+
+    def __receive_next(self) -> None:
+        """Reads the reply to the oldest outstanding command"""
+        sent, _, deadline, sent_at = self._outstanding[0]
+        try:
+            self._results.append(self.interface.receive(sent, deadline, sent_at))
+        except FIUCommandError as e:
+            #the complete reply was read, so the replies that follow still match their commands
+            self._results.append(None)
+            if self._error is None:
+                self._error = e
+        except BaseException:
+            #replies to the remaining commands can no longer be matched
+            self._outstanding.clear()
+            raise
+        del self._outstanding[0]
@@ -0,0 +1,176 @@
+import mmap
+import os
+import struct
+import threading
+from collections import deque
+from dataclasses import dataclass
+from time import monotonic, perf_counter, sleep, time
+from .fiu_types import FIUException
+
+#Direction of a journal record
+JOURNAL_SENT = 0
+JOURNAL_RECEIVED = 1
+#bytes of an incomplete response, recorded when its command timed out
+JOURNAL_TIMEOUT = 2
+
+JOURNAL_MAGIC = b"FIUJ"
+JOURNAL_VERSION = 1
+#magic, version, record size, wall clock and monotonic time the journal was created, and record count
+HEADER = struct.Struct("<4sHHddQ")
+HEADER_SIZE = 64
+COUNT = struct.Struct("<Q")
+COUNT_OFFSET = HEADER.size - COUNT.size
+#monotonic timestamp, direction, frame length, and the frame padded or truncated to the remaining bytes
+RECORD = struct.Struct("<dBxH52s")
+FRAME_SIZE = 52
+#records added to the file each time the journal fills up
+GROW_RECORDS = 16384
+
+
+@dataclass
+class JournalRecord:
+    """A frame read back from a command journal"""
+    timestamp: float
+    wall_time: float
+    direction: int
+    frame: bytes
+
+
+class CommandJournal(object):
+    """Append-only binary log of every frame sent to and received from the FIU, for post-mortem analysis and replay.
+    Records are fixed size and packed straight into a memory-mapped file, so journaling a command does no
+    formatting or system calls and the records survive the process exiting without a flush. The file grows
+    GROW_RECORDS records at a time, and opening an existing journal appends to it.
+    Frames longer than FRAME_SIZE bytes are truncated, with their full length kept in the record."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        exists = os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE
+        self._file = open(path, "r+b" if exists else "w+b")
+        if exists:
+            magic, version, record_size, self.created, self._created_monotonic, self._count = \
+                HEADER.unpack(self._file.read(HEADER.size))
+            if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION or record_size != RECORD.size:
+                self._file.close()
+                raise ValueError(f"{path} is not a version {JOURNAL_VERSION} FIU command journal")
+        else:
+            self.created, self._created_monotonic, self._count = time(), monotonic(), 0
+            self._file.write(HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, RECORD.size, self.created, self._created_monotonic, 0))
+            self._file.truncate(HEADER_SIZE + GROW_RECORDS * RECORD.size)
+        self._capacity = (os.path.getsize(path) - HEADER_SIZE) // RECORD.size
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        if self._count >= self._capacity:
+            self.__grow()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, direction: int, frame: bytes) -> None:
+        """Records a frame with the current monotonic time"""
+        timestamp = monotonic()
+        with self._lock:
+            if self._count == self._capacity:
+                self.__grow()
+            RECORD.pack_into(self._map, HEADER_SIZE + self._count * RECORD.size, timestamp, direction, len(frame), frame)
+            self._count += 1
+            COUNT.pack_into(self._map, COUNT_OFFSET, self._count)
+
+    def flush(self) -> None:
+        """Writes the records appended so far through to disk"""
+        with self._lock:
+            self._map.flush()
+
+    def close(self) -> None:
+        """Flushes and closes the journal"""
+        with self._lock:
+            if self._map.closed:
+                return
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+
+    def __grow(self) -> None:
+        """Extends the file by GROW_RECORDS records and maps the larger file"""
+        self._map.flush()
+        self._map.close()
+        self._capacity += GROW_RECORDS
+        self._file.truncate(HEADER_SIZE + self._capacity * RECORD.size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+
+def read_journal(path: str) -> list:
+    """Returns the JournalRecords of a command journal in the order they were recorded"""
+    with open(path, "rb") as file:
+        magic, version, record_size, created, created_monotonic, count = HEADER.unpack(file.read(HEADER.size))
+        if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION or record_size != RECORD.size:
+            raise ValueError(f"{path} is not a version {JOURNAL_VERSION} FIU command journal")
+        file.seek(HEADER_SIZE)
+        data = file.read(count * RECORD.size)
+    records = []
+    for timestamp, direction, length, frame in RECORD.iter_unpack(data):
+        records.append(JournalRecord(timestamp, created + timestamp - created_monotonic, direction, frame[:min(length, FRAME_SIZE)]))
+    return records
+
+def replay(records, interface: "CommInterface", speed: float = 1.0) -> list:
+    """Re-sends the commands in a journal to an open interface, such as a SimulatedFIU, one command at a time.
+    records is a journal path or a list of JournalRecords. Commands keep their recorded spacing divided by speed,
+    or are sent back-to-back if speed is None. Returns a (frame, recorded, replayed) tuple for every command, where
+    recorded is the response frame in the journal (None if the command timed out) and replayed is the response
+    data or FIUException from the interface."""
+    if isinstance(records, (str, os.PathLike)):
+        records = read_journal(records)
+    #match responses to commands in the order they were sent, as pipelined commands are
+    responses = dict()
+    waiting = deque()
+    for index, record in enumerate(records):
+        if record.direction == JOURNAL_SENT:
+            waiting.append(index)
+        elif waiting:
+            responses[waiting.popleft()] = record.frame if record.direction == JOURNAL_RECEIVED else None
+    results = []
+    first = start = None
+    for index, record in enumerate(records):
+        if record.direction != JOURNAL_SENT:
+            continue
+        if speed:
+            if first is None:
+                first, start = record.timestamp, perf_counter()
+            delay = (record.timestamp - first) / speed - (perf_counter() - start)
+            if delay > 0:
+                sleep(delay)
+        try:
+            replayed = interface.write_frame(record.frame)
+        except FIUException as e:
+            replayed = e
+        results.append((record.frame, responses.get(index), replayed))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Print or replay an FIU command journal")
+    parser.add_argument("journal", help="command journal file")
+    parser.add_argument("--replay", metavar="PORT", help="replay the commands on a serial port, or SIM for simulated modules")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor, 0 to send commands back-to-back")
+    args = parser.parse_args()
+    if args.replay is None:
+        directions = {JOURNAL_SENT: "->", JOURNAL_RECEIVED: "<-", JOURNAL_TIMEOUT: "<!"}
+        for record in read_journal(args.journal):
+            print(f"{record.wall_time:.6f} {directions.get(record.direction, '??')} {record.frame!r}")
+    else:
+        from .interfaces import RS485
+        from .simulator import SimulatedFIU
+        interface = SimulatedFIU() if args.replay == "SIM" else RS485(args.replay)
+        interface.open()
+        try:
+            for frame, recorded, replayed in replay(args.journal, interface, args.speed):
+                print(f"{frame!r} recorded {recorded!r} replayed {replayed!r}")
+        finally:
+            interface.close()
@@ -0,0 +1,101 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+
+#Upper bounds in seconds of the latency histogram buckets, the last bucket counts everything slower
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+@dataclass
+class CommandRecord:
+    """Timing and outcome of a single command, passed to the metrics hook. 
+    Latencies are in seconds from the start of the write, None when not reached."""
+    opcode: str
+    module: str
+    write: float
+    first_byte: float = None
+    frame: float = None
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    return_code: str = None
+    error: int = None
+
+
+class LatencyHistogram(object):
+    """Count, total, maximum, and bucketed distribution of latency samples"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, latency: float) -> None:
+        self.count += 1
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+        self.buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "buckets": list(self.buckets),
+        }
+
+
+class CommandMetrics(object):
+    """Per-command latency, throughput, and error counters for a communication interface.
+    Counters are kept per opcode, with latency histograms for the write, the first response byte, 
+    and the full response frame. An optional hook is called with the CommandRecord of every command."""
+
+    def __init__(self, hook=None) -> None:
+        self.hook = hook
+        self.reset()
+
+    def reset(self) -> None:
+        """Clears all counters"""
+        self.commands = dict()
+        self.latency = dict()
+        self.return_codes = dict()
+        self.crc_errors = 0
+        self.timeouts = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def record(self, record: CommandRecord) -> None:
+        """Adds a completed or failed command to the counters"""
+        op = record.opcode
+        self.commands[op] = self.commands.get(op, 0) + 1
+        histograms = self.latency.get(op)
+        if histograms is None:
+            histograms = self.latency[op] = {"write": LatencyHistogram(), "first_byte": LatencyHistogram(), "frame": LatencyHistogram()}
+        histograms["write"].add(record.write)
+        if record.first_byte is not None:
+            histograms["first_byte"].add(record.first_byte)
+        if record.frame is not None:
+            histograms["frame"].add(record.frame)
+        self.bytes_sent += record.bytes_sent
+        self.bytes_received += record.bytes_received
+        if record.return_code is not None:
+            self.return_codes[record.return_code] = self.return_codes.get(record.return_code, 0) + 1
+        if record.error == 5001:
+            self.timeouts += 1
+        elif record.error == 5005:
+            self.crc_errors += 1
+        if self.hook is not None:
+            self.hook(record)
+
+    def snapshot(self) -> dict:
+        """Returns a copy of all counters as a dictionary"""
+        return {
+            "commands": dict(self.commands),
+            "latency": {op: {name: hist.snapshot() for name, hist in histograms.items()} 
+                        for op, histograms in self.latency.items()},
+            "latency_buckets": list(LATENCY_BUCKETS),
+            "return_codes": dict(self.return_codes),
+            "crc_errors": self.crc_errors,
+            "timeouts": self.timeouts,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+        }
@@ -0,0 +1,132 @@
+import threading
+from .driver import *
+
+class RelayMonitor(object):
+    """Background watchdog comparing the FIU hardware with the driver's state manager.
+    Every interval seconds one module (in turn) has its relay and interlock state read, but only when 
+    neither the FIU nor its bus is in use, so polls never delay foreground commands. While the bus is busy 
+    or a poll fails, the interval doubles up to max_interval, and returns to interval after a successful poll.
+    When a module's relay states differ from the state manager (e.g. an interlock trip, or a module power 
+    cycling back to RESET), the state manager is updated to match and on_change is called with the module ID 
+    and the (channel, expected, actual) differences. on_interlock is called with the module ID and new state 
+    when a module's interlock changes, and on_error with any exception raised by a poll. 
+    If an asyncio event loop is provided, callbacks are called on the loop's thread."""
+
+    def __init__(self, fiu: FIU, interval: float = 1.0, max_interval: float = 10.0, on_change=None, 
+                 on_interlock=None, on_error=None, loop=None) -> None:
+        self.fiu = fiu
+        self.interval = interval
+        self.max_interval = max(max_interval, interval)
+        self.on_change = on_change
+        self.on_interlock = on_interlock
+        self.on_error = on_error
+        self.loop = loop
+        self.interlocks = dict()
+        self._waiters = []
+        self._waiters_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """Starts polling on a background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.__run, name=f"FIU monitor {self.fiu.resource}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops polling and waits for the background thread to finish. 
+        Called from a callback, the thread finishes once the callback returns."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    async def wait_for_change(self) -> tuple:
+        """Waits for the next relay or interlock change, returning (mod_id, kind, details) where kind is 
+        "relay" with the list of differences, or "interlock" with the new interlock state"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._waiters_lock:
+            self._waiters.append((loop, future))
+        return await future
+
+    def poll(self, mod_id: int) -> None:
+        """Reads the relay and interlock state of a module, reporting any changes"""
+        self.__report(self.__read(mod_id))
+
+    def __read(self, mod_id: int) -> list:
+        """Reads the relay and interlock state of a module, returning the (callback, mod_id, kind, details) 
+        notifications for its changes so they can be reported once the locks are released"""
+        differences = self.fiu.reconcile([mod_id])[mod_id]
+        interlock = self.fiu.interlock_state(mod_id)
+        notifications = []
+        if differences:
+            notifications.append((self.on_change, mod_id, "relay", differences))
+        previous = self.interlocks.get(mod_id)
+        self.interlocks[mod_id] = interlock
+        if previous is not None and previous != interlock:
+            notifications.append((self.on_interlock, mod_id, "interlock", interlock))
+        return notifications
+
+    def __report(self, notifications: list) -> None:
+        for notification in notifications:
+            self.__notify(*notification)
+
+    def __try_poll(self, mod_id: int) -> bool:
+        """Polls the module if the FIU and bus are idle, returns whether the poll ran.
+        Callbacks are called after the locks are released, so they never hold up foreground commands."""
+        fiu_lock, bus_lock = self.fiu._lock, getattr(self.fiu.interface, "lock", None)
+        if not fiu_lock.acquire(blocking=False):
+            return False
+        try:
+            if bus_lock is not None and not bus_lock.acquire(blocking=False):
+                return False
+            try:
+                notifications = self.__read(mod_id)
+            finally:
+                if bus_lock is not None:
+                    bus_lock.release()
+        finally:
+            fiu_lock.release()
+        self.__report(notifications)
+        return True
+
+    def __run(self) -> None:
+        wait = self.interval
+        index = 0
+        while not self._stop.wait(wait):
+            modules = self.fiu.module_IDs
+            if not modules:
+                continue
+            mod_id = modules[index % len(modules)]
+            try:
+                polled = self.__try_poll(mod_id)
+            except BaseException as e:
+                polled = False
+                self.__notify(self.on_error, mod_id, None, e)
+            if polled:
+                index += 1
+                wait = self.interval
+            else:
+                wait = min(wait * 2, self.max_interval)
+
+    def __notify(self, callback, mod_id: int, kind: str, details) -> None:
+        """Calls a callback, on the event loop if there is one, and wakes any waiting coroutines"""
+        if callback is not None:
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(callback, mod_id, details)
+            else:
+                callback(mod_id, details)
+        if kind is None:
+            return
+        with self._waiters_lock:
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(self.__resolve, future, (mod_id, kind, details))
+
+    @staticmethod
+    def __resolve(future, result) -> None:
+        if not future.done():
+            future.set_result(result)
@@ -0,0 +1,187 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from .driver import *
+
+class FIUSystem(object):
+    """Orchestrates several FIU chains, each with its own FIU object on a separate RS-485 bus, that share
+    one DMM and fault bus. Only one channel in the whole system may be in a measurement or fault to ground
+    state at a time. The channels using the shared bus are tracked in a single index covering every chain,
+    and the changes that take the bus are serialized with the system's bus lock. All other changes are
+    routed to their chains in parallel, one worker thread per bus.
+    Chains should only be commanded through the system, since channels put on the shared bus directly
+    through an FIU object are not seen by the index until the chain is reconciled."""
+
+    def __init__(self, chains, max_workers: int = None) -> None:
+        """chains is a dictionary of FIU objects keyed by chain name, or a list of FIU objects keyed by their comm resource.
+        Every chain is configured for a shared DMM."""
+        if isinstance(chains, dict):
+            self.chains = dict(chains)
+        else:
+            self.chains = dict()
+            for fiu in chains:
+                if fiu.resource in self.chains:
+                    raise ValueError(f"Duplicate FIU chain {fiu.resource}, provide a dictionary of chain names")
+                self.chains[fiu.resource] = fiu
+        self._executor = ThreadPoolExecutor(max_workers or len(self.chains), thread_name_prefix="FIUSystem")
+        self._bus_lock = threading.Lock()
+        #FIUState of every channel in the system using the shared DMM/fault bus, keyed by (chain, mod_id, channel)
+        self._bus_users = dict()
+        for name, fiu in self.chains.items():
+            fiu.configure(shared_dmm=True)
+            self.__refresh(name)
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.disconnect()
+        finally:
+            self.close()
+
+    def connect(self) -> None:
+        """Connects every chain in parallel"""
+        self.__run_all({name: fiu.connect for name, fiu in self.chains.items()})
+
+    def disconnect(self) -> None:
+        """Disconnects every chain in parallel"""
+        try:
+            self.__run_all({name: fiu.disconnect for name, fiu in self.chains.items()})
+        finally:
+            self.__refresh_all()
+
+    def close(self) -> None:
+        """Stops the system's worker threads"""
+        self._executor.shutdown()
+
+    @property
+    def bus_users(self) -> list:
+        """(chain, mod_id, channel, FIUState) of every channel in the system using the shared DMM/fault bus"""
+        with self._bus_lock:
+            return [(*key, state) for key, state in self._bus_users.items()]
+
+    def connect_channels_all(self) -> None:
+        """Sets all channels on every chain to CONNECTED state, in parallel"""
+        try:
+            self.__run_all({name: fiu.connect_channels_all for name, fiu in self.chains.items()})
+        finally:
+            self.__refresh_all()
+
+    def set_state(self, chain, mod_id: int, channel: int, state: FIUState) -> None:
+        """Sets the state of a single channel on the provided chain"""
+        self.apply([(chain, mod_id, channel, state)])
+
+    def validate(self, changes: list) -> list:
+        """Validates a list of (chain, mod_id, channel, FIUState) changes applied in order, without sending any commands.
+        Each chain's changes are validated by its FIU, then the whole batch is checked against the shared bus index.
+        Raises an FIUException for the first invalid or unsafe change, otherwise returns the changes with each
+        state converted to an FIUState."""
+        changes = [(name, mod_id, channel, FIUState(state)) for name, mod_id, channel, state in changes]
+        for name, group in self.__group(changes).items():
+            self.chains[name].validate(group)
+        with self._bus_lock:
+            self.__check_bus(changes)
+        return changes
+
+    def apply(self, changes: list) -> None:
+        """Sets the state of channels across the system. changes is a list of (chain, mod_id, channel, FIUState)
+        tuples applied in order, and the entire batch is validated before any command is sent.
+        Changes that put a channel on the shared bus are sent one at a time with the bus lock held, once every
+        change before them has completed. The changes between them are sent to their chains in parallel,
+        each chain's changes as one FIU.apply batch. If a chain fails, FIU.apply restores that chain's channels,
+        the other chains finish their changes, and no later changes are sent."""
+        phase = dict()
+        for name, mod_id, channel, state in self.validate(changes):
+            if BUS_STATES[state]:
+                #everything before a bus transition must be complete, so a channel leaving the bus has been released
+                self.__run_phase(phase)
+                phase = dict()
+                self.__acquire_bus(name, mod_id, channel, state)
+            else:
+                phase.setdefault(name, []).append((mod_id, channel, state))
+        self.__run_phase(phase)
+
+    def reconcile(self) -> dict:
+        """Reads the relay state of every chain in parallel and updates the shared bus index to match.
+        Returns the differences found by FIU.reconcile keyed by chain name."""
+        try:
+            return self.__run_all({name: fiu.reconcile for name, fiu in self.chains.items()})
+        finally:
+            self.__refresh_all()
+
+    def snapshot(self) -> dict:
+        """Takes a SystemSnapshot of every chain in parallel, keyed by chain name"""
+        try:
+            return self.__run_all({name: fiu.snapshot for name, fiu in self.chains.items()})
+        finally:
+            self.__refresh_all()
+
+    def __group(self, changes: list) -> dict:
+        """Splits system changes into the (mod_id, channel, state) changes for each chain, keeping their order"""
+        groups = dict()
+        for name, mod_id, channel, state in changes:
+            if name not in self.chains:
+                raise KeyError(f"Unknown FIU chain: {name}")
+            groups.setdefault(name, []).append((mod_id, channel, state))
+        return groups
+
+    def __check_bus(self, changes: list) -> None:
+        """Checks that the changes, applied in order, never give the shared bus more than one user.
+        Must be called with the bus lock held."""
+        users = dict(self._bus_users)
+        for name, mod_id, channel, state in changes:
+            key = (name, mod_id, channel)
+            if BUS_STATES[state]:
+                for other in users:
+                    if other != key:
+                        raise FIUException(5012, channel, state.name, other[1], other[2], other[0])
+                users[key] = state
+            else:
+                users.pop(key, None)
+
+    def __acquire_bus(self, name, mod_id: int, channel: int, state: FIUState) -> None:
+        """Sends a change that puts a channel on the shared bus, with the bus lock held from the check
+        until the index is updated"""
+        with self._bus_lock:
+            self.__check_bus([(name, mod_id, channel, state)])
+            try:
+                self.chains[name].apply([(mod_id, channel, state)])
+            finally:
+                self.__refresh(name)
+
+    def __run_phase(self, phase: dict) -> None:
+        """Applies each chain's changes in parallel, then updates the bus index for the chains changed"""
+        if not phase:
+            return
+        try:
+            self.__run_all({name: partial(self.chains[name].apply, group) for name, group in phase.items()})
+        finally:
+            with self._bus_lock:
+                for name in phase:
+                    self.__refresh(name)
+
+    def __run_all(self, calls: dict) -> dict:
+        """Runs one call per chain in parallel and waits for all of them to finish. Returns the results keyed
+        by chain name, or raises the first exception raised by a call"""
+        if len(calls) == 1:
+            #no thread hand off needed for a single chain
+            name, call = next(iter(calls.items()))
+            return {name: call()}
+        futures = {name: self._executor.submit(call) for name, call in calls.items()}
+        wait(futures.values())
+        return {name: future.result() for name, future in futures.items()}
+
+    def __refresh(self, name) -> None:
+        """Replaces a chain's entries in the bus index with the channels its state manager shows using the bus.
+        Must be called with the bus lock held, or before the system is shared between threads."""
+        for key in [key for key in self._bus_users if key[0] == name]:
+            del self._bus_users[key]
+        for mod_id, channel, state in self.chains[name].bus_users():
+            self._bus_users[(name, mod_id, channel)] = state
+
+    def __refresh_all(self) -> None:
+        with self._bus_lock:
+            for name in self.chains:
+                self.__refresh(name)
@@ -0,0 +1,198 @@
+from dataclasses import dataclass
+from itertools import chain
+from .driver import *
+
+#Lookup of whether each byte value is an FIUState that connects the channel to the shared DMM/fault bus,
+#for translating a whole state array at once
+BUS_TABLE = bytes(BUS_STATES[state] if state < len(BUS_STATES) else 0 for state in range(256))
+#states that may be set on every channel of a module with one 99 broadcast command
+BROADCAST_STATES = tuple(state for state in STATE_COMMANDS if not BUS_STATES[state])
+
+@dataclass
+class PlanStage:
+    """A step of a fault campaign plan. frames are sent together, pipelined, and make the (mod_id, channel, FIUState)
+    changes in order, with a 99 broadcast frame accounting for every channel of its module. points are the
+    (mod_id, channel, FIUState) test points established once the stage has completed, and transitions is the
+    number of channels whose state the stage changes."""
+    frames: tuple
+    changes: tuple
+    points: tuple
+    transitions: int = 0
+
+
+class CampaignPlanner(object):
+    """Plans a fault campaign that puts every channel in channels on every module in mod_ids through each fault state
+    in faults, returning it to the baseline state afterwards.
+    Test points are ordered channel by channel so each channel goes through all of its faults before being restored,
+    with the faults that do not use the DMM/fault bus first. With isolation "module" only the other channels of the
+    same module must be at the baseline, so the modules are swept together (one module at a time for bus faults
+    with a shared DMM). With isolation "system" every other channel in the system is at the baseline.
+    Each stage is compiled by comparing whole state arrays, using a 99 broadcast command when it takes fewer
+    frames, and is proven safe before it is yielded: it passes the StateManager batch check, and the channels
+    using the bus before or after the stage never exceed one per module (or one in the system with a shared DMM),
+    so every intermediate state is safe in whatever order the pipelined commands complete."""
+
+    def __init__(self, mod_ids: list, channels: list = range(1, CHANNEL_COUNT + 1),
+                 faults: list = (FIUState.DISCONNECTED, FIUState.VOLT_MEASUREMENT, FIUState.CURR_MEASUREMENT, FIUState.FAULT_TO_GND),
+                 baseline: FIUState = FIUState.CONNECTED, shared_dmm: bool = False, isolation: str = "module") -> None:
+        for id in mod_ids:
+            if id not in range(0, MODULE_COUNT):
+                raise IndexError(f"Invalid Module ID: {id}\nFIU Module IDs must be in range 0-7 for RS-485 communication")
+        for channel in channels:
+            if channel not in range(1, CHANNEL_COUNT + 1):
+                raise FIUException(5051)
+        self.mod_ids = sorted(mod_ids)
+        self.channels = list(channels)
+        self.baseline = FIUState(baseline)
+        if self.baseline not in BROADCAST_STATES:
+            raise ValueError(f"The campaign baseline must be one of {[state.name for state in BROADCAST_STATES]}")
+        self.faults = [FIUState(fault) for fault in faults]
+        for fault in self.faults:
+            if fault not in STATE_COMMANDS or fault == self.baseline:
+                raise FIUException(5011, 0, fault.name)
+        if isolation not in ("module", "system"):
+            raise ValueError('isolation must be "module" or "system"')
+        self.shared_dmm = shared_dmm
+        self.isolation = isolation
+
+    def stages(self, initial: bytes = None):
+        """Generates the stages of the plan, proving each one safe before it is yielded. initial is the FIUState of every
+        channel as MODULE_COUNT x CHANNEL_COUNT bytes indexed by module ID. It defaults to unknown (RESET), so the plan
+        starts by broadcasting the baseline state to every module."""
+        current = bytearray(MODULE_COUNT * CHANNEL_COUNT) if initial is None else bytearray(initial)
+        state_mgr = StateManager(self.mod_ids)
+        for mod_id in self.mod_ids:
+            start = mod_id * CHANNEL_COUNT
+            state_mgr.load_module_state(mod_id, current[start:start + CHANNEL_COUNT])
+        #an empty set of points after the last one returns every channel to the baseline
+        for points in chain(self.__point_sets(), [()]):
+            target = self.__target(current, points)
+            for stage in self.__compile(current, target, points):
+                if stage.frames or stage.points:
+                    self.__prove(state_mgr, current, stage)
+                    yield stage
+
+    def plan(self, initial: bytes = None) -> list:
+        """Returns every stage of the plan as a list"""
+        return list(self.stages(initial))
+
+    def summary(self, initial: bytes = None) -> dict:
+        """Counts the stages, frames, test points, and channel transitions of the plan"""
+        counts = dict(stages=0, frames=0, points=0, transitions=0)
+        for stage in self.stages(initial):
+            counts["stages"] += 1
+            counts["frames"] += len(stage.frames)
+            counts["points"] += len(stage.points)
+            counts["transitions"] += stage.transitions
+        return counts
+
+    def run(self, fiu: FIU):
+        """Runs the plan on the FIU one stage at a time, starting from each module's relay state. Yields each stage
+        with test points once its commands have completed, so measurements can be taken before the plan continues.
+        Once the generator is exhausted every channel has been returned to the baseline state."""
+        initial = bytearray(MODULE_COUNT * CHANNEL_COUNT)
+        for mod_id in self.mod_ids:
+            start = mod_id * CHANNEL_COUNT
+            initial[start:start + CHANNEL_COUNT] = bytes(fiu.relay_state(mod_id, cached=True))
+        for stage in self.stages(initial):
+            fiu._write_batch(stage.frames, stage.changes)
+            if stage.points:
+                yield stage
+
+    def __point_sets(self):
+        """Generates the sets of test points in the order they are established"""
+        order = [fault for fault in self.faults if not BUS_STATES[fault]] + [fault for fault in self.faults if BUS_STATES[fault]]
+        if self.isolation == "system":
+            for mod_id in self.mod_ids:
+                for channel in self.channels:
+                    for fault in order:
+                        yield ((mod_id, channel, fault),)
+            return
+        for channel in self.channels:
+            for fault in order:
+                if BUS_STATES[fault] and self.shared_dmm:
+                    continue
+                yield tuple((mod_id, channel, fault) for mod_id in self.mod_ids)
+            if self.shared_dmm:
+                #the DMM can only be connected to one module at a time, so each module takes its turn with every bus fault
+                for mod_id in self.mod_ids:
+                    for fault in order:
+                        if BUS_STATES[fault]:
+                            yield ((mod_id, channel, fault),)
+
+    def __target(self, current: bytearray, points: tuple) -> bytearray:
+        """Returns the state of every channel while the points are established"""
+        target = bytearray(current)
+        baseline = bytes((self.baseline,)) * CHANNEL_COUNT
+        point_mods = {mod_id for mod_id, _, _ in points}
+        for mod_id in self.mod_ids:
+            start = mod_id * CHANNEL_COUNT
+            if mod_id in point_mods or self.isolation == "system" or not points:
+                target[start:start + CHANNEL_COUNT] = baseline
+            elif self.shared_dmm and current[start:start + CHANNEL_COUNT].translate(BUS_TABLE).count(1):
+                #release the shared bus, other channels of a module without points keep their state
+                for index in range(start, start + CHANNEL_COUNT):
+                    if BUS_TABLE[current[index]]:
+                        target[index] = self.baseline
+        for mod_id, channel, state in points:
+            target[mod_id * CHANNEL_COUNT + channel - 1] = state
+        return target
+
+    def __compile(self, current: bytearray, target: bytearray, points: tuple) -> list:
+        """Returns the stages that take the channels from current to target. The changes are split into a stage that
+        only leaves the bus followed by one that joins it, when making them together could give the bus two users."""
+        ops = []
+        for mod_id in self.mod_ids:
+            start = mod_id * CHANNEL_COUNT
+            before, after = current[start:start + CHANNEL_COUNT], target[start:start + CHANNEL_COUNT]
+            if before != after:
+                ops += self.__module_ops(mod_id, before, after)
+        if self.__bus_safe(current, target):
+            return [self.__stage(ops, points)]
+        return [self.__stage([op for op in ops if not op[2]], ()), self.__stage([op for op in ops if op[2]], points)]
+
+    def __module_ops(self, mod_id: int, before: bytearray, after: bytearray) -> list:
+        """Returns the (frame, changes, joins bus) commands that take one module from before to after,
+        using a 99 broadcast when it takes fewer frames than setting each changed channel"""
+        changed = [index for index in range(CHANNEL_COUNT) if before[index] != after[index]]
+        best = None
+        for state in BROADCAST_STATES:
+            #one broadcast, then every channel that does not end in the broadcast state
+            frames = 1 + CHANNEL_COUNT - after.count(state)
+            if frames < len(changed) and (best is None or frames < best[0]):
+                best = (frames, state)
+        ops = []
+        if best is not None:
+            state = best[1]
+            ops.append((CHANNEL_FRAMES[state][mod_id][99], tuple((mod_id, channel, state) for channel in range(1, CHANNEL_COUNT + 1)), False))
+            changed = [index for index in range(CHANNEL_COUNT) if after[index] != state]
+        for index in changed:
+            state = FIUState(after[index])
+            ops.append((CHANNEL_FRAMES[state][mod_id][index + 1], ((mod_id, index + 1, state),), bool(BUS_STATES[state])))
+        return ops
+
+    def __stage(self, ops: list, points: tuple) -> PlanStage:
+        return PlanStage(tuple(op[0] for op in ops), tuple(change for op in ops for change in op[1]), points)
+
+    def __bus_safe(self, before: bytes, after: bytes) -> bool:
+        """Checks that the channels using the bus in either state never exceed one per module, or one in the
+        system with a shared DMM, so any mix of the two states is safe"""
+        size = len(before)
+        users = (int.from_bytes(before.translate(BUS_TABLE), "little") |
+                 int.from_bytes(after.translate(BUS_TABLE), "little")).to_bytes(size, "little")
+        if self.shared_dmm:
+            return users.count(1) <= 1
+        return all(users[start:start + CHANNEL_COUNT].count(1) <= 1 for start in range(0, size, CHANNEL_COUNT))
+
+    def __prove(self, state_mgr: StateManager, current: bytearray, stage: PlanStage) -> None:
+        """Proves a stage safe with the StateManager rules and the bus check, then applies it to the current state"""
+        unsafe = state_mgr.check_batch_transition(stage.changes, self.shared_dmm)
+        if unsafe is not None:
+            raise FIUException(5010, unsafe[1], unsafe[2].name)
+        before = bytes(current)
+        for mod_id, channel, state in stage.changes:
+            current[mod_id * CHANNEL_COUNT + channel - 1] = state
+        if not self.__bus_safe(before, current):
+            raise FIUException(5010, stage.changes[-1][1], stage.changes[-1][2].name)
+        state_mgr.set_batch_state(stage.changes)
+        stage.transitions = sum(1 for a, b in zip(before, current) if a != b)
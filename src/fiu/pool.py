@@ -0,0 +1,70 @@
+import atexit
+import threading
+from dataclasses import astuple
+from .interfaces import *
+
+class InterfacePool(object):
+    """Process-wide pool of open FIU communication interfaces, keyed by port name and port settings.
+    Interfaces stay open after they are released, so short-lived FIU sessions on the same port skip 
+    reopening the serial device. Each module is verified with a software version query the first time 
+    it is requested on an interface. factory creates a closed interface from a port name and settings."""
+
+    def __init__(self, factory=RS485) -> None:
+        self.factory = factory
+        self._lock = threading.Lock()
+        #[interface, number of users, verified module IDs] keyed by (port, port settings)
+        self._entries = dict()
+
+    def acquire(self, port: str, port_settings: DefaultPortSettings = DefaultPortSettings(), mod_ids: list = ()) -> CommInterface:
+        """Returns an open interface for the port and settings, opening one if needed, 
+        after verifying each of the module IDs responds on it"""
+        key = (port, astuple(port_settings))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                for other_port, _ in self._entries:
+                    if other_port == port:
+                        raise RuntimeError(f"Port {port} is already open in the pool with different port settings")
+                interface = self.factory(port, port_settings)
+                interface.open()
+                entry = self._entries[key] = [interface, 0, set()]
+            interface, _, verified = entry
+            try:
+                for mod_id in mod_ids:
+                    if mod_id not in verified:
+                        interface.write_cmd(f"H{mod_id}")
+                        verified.add(mod_id)
+            except BaseException:
+                if entry[1] == 0:
+                    #do not keep an interface that failed verification before anyone used it
+                    interface.close()
+                    del self._entries[key]
+                raise
+            entry[1] += 1
+            return interface
+
+    def release(self, interface: CommInterface, close: bool = False) -> None:
+        """Returns an interface to the pool. The interface stays open for reuse unless close is True 
+        and no one else is using it."""
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry[0] is interface:
+                    entry[1] = max(entry[1] - 1, 0)
+                    if close and entry[1] == 0:
+                        interface.close()
+                        del self._entries[key]
+                    return
+
+    def close_all(self) -> None:
+        """Closes every interface in the pool"""
+        with self._lock:
+            for interface, _, _ in self._entries.values():
+                try:
+                    interface.close()
+                except Exception:
+                    pass
+            self._entries.clear()
+
+#Pool shared by every FIU created with pool=default_pool
+default_pool = InterfacePool()
+atexit.register(default_pool.close_all)
@@ -0,0 +1,108 @@
+import threading
+from dataclasses import dataclass
+from time import perf_counter, sleep
+from .driver import *
+
+@dataclass
+class SequenceStep:
+    """A channel state change scheduled t_offset seconds after the start of a fault sequence"""
+    t_offset: float
+    mod_id: int
+    channel: int
+    state: FIUState
+
+@dataclass
+class StepResult:
+    """Timing of a sequence step, in seconds from the start of the sequence.
+    scheduled is the step's t_offset, sent is when the command was written, 
+    and completed is when the FIU's response was received."""
+    step: SequenceStep
+    scheduled: float
+    sent: float
+    completed: float
+
+    @property
+    def latency(self) -> float:
+        """Seconds the command was sent after its scheduled time"""
+        return self.sent - self.scheduled
+
+
+class FaultSequence(object):
+    """Runs a timeline of channel state changes on an FIU at scheduled times.
+    The whole timeline is validated against the state manager rules and its command frames are built 
+    before the first step is sent. Steps run in t_offset order on a dedicated thread against a monotonic 
+    clock, and the scheduled, sent, and completed time of every step is recorded in results.
+    Each step is checked again with the FIU's lock held as it is sent, and the sequence stops with an 
+    FIUException if a change made by another thread has made it unsafe."""
+
+    #seconds before a step's scheduled time to stop sleeping and wait on the clock
+    spin_time = 0.002
+
+    def __init__(self, fiu: FIU, steps: list) -> None:
+        self.fiu = fiu
+        self.steps = sorted((step if isinstance(step, SequenceStep) else SequenceStep(*step) for step in steps), 
+                            key=lambda step: step.t_offset)
+        self.results = []
+        self.error = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.__validate()
+
+    def __validate(self) -> None:
+        """Validates the timeline against the current state of the FIU and builds its command frames"""
+        changes = self.fiu.validate([(step.mod_id, step.channel, step.state) for step in self.steps])
+        self._plan = [(step, CHANNEL_FRAMES[state][mod_id][channel], mod_id, channel, state) 
+                      for step, (mod_id, channel, state) in zip(self.steps, changes)]
+
+    def start(self) -> None:
+        """Re-validates the timeline against the current state of the FIU and starts running it on a dedicated thread"""
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError("Fault sequence is already running")
+        self.__validate()
+        self.results = []
+        self.error = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.__run, name="FIU fault sequence", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the sequence before its next step is sent"""
+        self._stop.set()
+
+    def wait(self, timeout: float = None) -> list:
+        """Waits for the sequence to finish and returns the step results. 
+        Raises the error that stopped the sequence, if any."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                raise TimeoutError("Fault sequence is still running")
+        if self.error is not None:
+            raise self.error
+        return self.results
+
+    def run(self) -> list:
+        """Runs the sequence and waits for it to finish"""
+        self.start()
+        return self.wait()
+
+    def __run(self) -> None:
+        start = perf_counter()
+        try:
+            for step, frame, mod_id, channel, state in self._plan:
+                #sleep until just before the step is due, then wait on the clock for the exact time
+                due = start + step.t_offset
+                remaining = due - perf_counter() - self.spin_time
+                if remaining > 0 and self._stop.wait(remaining):
+                    return
+                while perf_counter() < due:
+                    pass
+                if self._stop.is_set():
+                    return
+                with self.fiu._lock:
+                    #other threads may have changed the FIU since the timeline was validated
+                    self.fiu.validate([(mod_id, channel, state)])
+                    sent = perf_counter()
+                    self.fiu._write_change(frame, mod_id, channel, state)
+                self.results.append(StepResult(step, step.t_offset, sent - start, perf_counter() - start))
+        except BaseException as e:
+            self.error = e
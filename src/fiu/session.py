@@ -0,0 +1,195 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from .driver import *
+
+#Request priorities, lower values are executed first
+PRIORITY_SAFETY = 0
+PRIORITY_NORMAL = 1
+PRIORITY_MONITOR = 2
+
+#FIU methods that return the system to a safe state, executed ahead of other queued requests
+SAFETY_METHODS = ("connect_channels_all", "set_open_circuit_fault_all", "disconnect")
+
+
+class FIUSession(object):
+    """Broker giving many worker threads safe concurrent access to one FIU and its serial bus.
+    Requests are executed one at a time on a dedicated thread. Higher priority requests run first, 
+    and requests of equal priority are taken round-robin between clients, so one busy worker cannot 
+    starve the others. Methods that return the system to a safe state run at PRIORITY_SAFETY.
+    Use client() to get a proxy with the FIU's methods for each worker."""
+
+    def __init__(self, fiu: FIU) -> None:
+        self.fiu = fiu
+        self._condition = threading.Condition()
+        #pending requests by priority, then by client in round-robin order
+        self._pending = dict()
+        self._closed = False
+        self._thread = threading.Thread(target=self.__run, name=f"FIU session {fiu.resource}", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, method: str, *args, priority: int = None, client=None, **kwargs) -> Future:
+        """Queues a call to an FIU method, returning a Future for its result. priority defaults to 
+        PRIORITY_SAFETY for safety methods and PRIORITY_NORMAL otherwise. client identifies the 
+        requester for round-robin scheduling, and defaults to the calling thread. Only public FIU methods can be called."""
+        func = getattr(self.fiu, method, None) if isinstance(method, str) and not method.startswith("_") else None
+        if not callable(func):
+            raise AttributeError(f"{method!r} is not a public FIU method")
+        if priority is None:
+            priority = PRIORITY_SAFETY if method in SAFETY_METHODS else PRIORITY_NORMAL
+        if client is None:
+            client = threading.get_ident()
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("FIU session is closed")
+            clients = self._pending.setdefault(priority, OrderedDict())
+            clients.setdefault(client, deque()).append((future, func, args, kwargs))
+            self._condition.notify()
+        return future
+
+    def call(self, method: str, *args, priority: int = None, client=None, **kwargs):
+        """Calls an FIU method through the session and waits for its result"""
+        return self.submit(method, *args, priority=priority, client=client, **kwargs).result()
+
+    def client(self, name=None) -> "SessionClient":
+        """Returns a proxy that calls FIU methods through the session as the named client"""
+        return SessionClient(self, name)
+
+    def close(self, wait: bool = True) -> None:
+        """Stops accepting requests. Requests already queued are still executed."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if wait:
+            self._thread.join()
+
+    def __next_request(self):
+        """Removes and returns the next request to execute, or None once the session is closed and idle"""
+        with self._condition:
+            while True:
+                for priority in sorted(self._pending):
+                    clients = self._pending[priority]
+                    if clients:
+                        #take the oldest request of the next client, then move the client to the back
+                        client, requests = next(iter(clients.items()))
+                        request = requests.popleft()
+                        del clients[client]
+                        if requests:
+                            clients[client] = requests
+                        return request
+                if self._closed:
+                    return None
+                self._condition.wait()
+
+    def __run(self) -> None:
+        while True:
+            request = self.__next_request()
+            if request is None:
+                return
+            future, func, args, kwargs = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+class SessionClient(object):
+    """Proxy calling FIU methods through an FIUSession. 
+    Every public FIU method is available, and waits for its result."""
+
+    def __init__(self, session: FIUSession, name=None) -> None:
+        self._session = session
+        self._name = name if name is not None else id(self)
+
+    def __getattr__(self, method: str):
+        if method.startswith("_") or not callable(getattr(self._session.fiu, method, None)):
+            raise AttributeError(method)
+        def call(*args, priority: int = None, **kwargs):
+            return self._session.call(method, *args, priority=priority, client=self._name, **kwargs)
+        return call
+
+
+class FIUSessionServer(object):
+    """Shares an FIUSession with other processes over a local socket (or named pipe on Windows).
+    Each connection is served on its own thread as a separate client of the session. Connections must 
+    authenticate with authkey before any request is read. A random key is generated if none is provided, 
+    and is available as the authkey attribute to pass to FIUSessionClient."""
+
+    def __init__(self, session: FIUSession, address, authkey: bytes = None) -> None:
+        self.session = session
+        self.authkey = os.urandom(32) if authkey is None else authkey
+        self._listener = Listener(address, authkey=self.authkey)
+        self.address = self._listener.address
+        self._thread = threading.Thread(target=self.__accept, name="FIU session server", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stops accepting connections"""
+        self._listener.close()
+
+    def __accept(self) -> None:
+        while True:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                #keep serving other clients after a connection with the wrong key
+                continue
+            except (OSError, EOFError):
+                return
+            threading.Thread(target=self.__serve, args=(conn,), daemon=True).start()
+
+    def __serve(self, conn) -> None:
+        client = object()
+        with conn:
+            while True:
+                try:
+                    method, args, kwargs, priority = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    result = (True, self.session.call(method, *args, priority=priority, client=client, **kwargs))
+                except BaseException as e:
+                    result = (False, e)
+                conn.send(result)
+
+
+class FIUSessionClient(object):
+    """Connection to an FIUSessionServer in another process, authenticated with the server's authkey. 
+    Every public FIU method is available, and waits for its result."""
+
+    def __init__(self, address, authkey: bytes) -> None:
+        self._conn = Client(address, authkey=authkey)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __getattr__(self, method: str):
+        if method.startswith("_"):
+            raise AttributeError(method)
+        def call(*args, priority: int = None, **kwargs):
+            with self._lock:
+                self._conn.send((method, args, kwargs, priority))
+                ok, result = self._conn.recv()
+            if not ok:
+                raise result
+            return result
+        return call
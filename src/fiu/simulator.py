@@ -0,0 +1,212 @@
+import threading
+from time import monotonic, sleep
+from .interfaces import *
+from .codec import FrameDecoder, encode_response
+
+#Length of each command (without CRC and termination) by command character
+COMMAND_LENGTHS = {"S": 2, "H": 2, "L": 2, "O": 3, "C": 4, "D": 4, "V": 4, "I": 4, "F": 4}
+
+#Relay state character reported by the S command for each FIUState
+STATE_CODES = {FIUState.RESET: "R", **{state: code for code, state in RELAY_STATE_CODES.items()}}
+
+
+class SimulatedModule(object):
+    """Model of a single Fault Insertion Unit module's command handling"""
+
+    def __init__(self, mod_id: int, version: str = "SIM 1.1.0") -> None:
+        self.mod_id = mod_id
+        self.version = version
+        self.states = [FIUState.CONNECTED] * CHANNEL_COUNT
+        self.interlock = False
+
+    def power_cycle(self) -> None:
+        """Simulates the module restarting, with every channel in the RESET state and the interlock override cleared"""
+        self.states = [FIUState.RESET] * CHANNEL_COUNT
+        self.interlock = False
+
+    def handle(self, cmd: str) -> bytes:
+        """Executes a command (without CRC and termination) and returns the response, 
+        return code and data, without CRC and termination"""
+        op = cmd[0]
+        if op == "S":
+            return b"1" + "".join(STATE_CODES[state] for state in self.states).encode('ascii')
+        elif op == "H":
+            return b"1" + self.version.encode('ascii')
+        elif op == "L":
+            return b"1" + (b"1" if self.interlock else b"0")
+        elif op == "O":
+            if cmd[2] not in "01":
+                return b"2Invalid Parameter"
+            self.interlock = cmd[2] == "1"
+            return b"0"
+        channel = int(cmd[2:4]) if cmd[2:4].isdigit() else 0
+        state = RELAY_STATE_CODES[op]
+        if channel == 99 and state in (FIUState.CONNECTED, FIUState.DISCONNECTED):
+            self.states = [state] * CHANNEL_COUNT
+            return b"0"
+        if not 1 <= channel <= CHANNEL_COUNT:
+            return b"2Invalid Channel"
+        if BUS_STATES[state]:
+            for i, current in enumerate(self.states):
+                if BUS_STATES[current] and i != channel - 1:
+                    #another channel is already using the bus
+                    return f"3Channel {i + 1:02d} {current.name}".encode('ascii')
+        self.states[channel - 1] = state
+        return b"0"
+
+
+class SimulatedSerial(object):
+    """In-process stand-in for a pyserial port connected to an RS-485 bus of simulated FIU modules.
+    Each request and response byte takes byte_time seconds on the wire, and each module takes command_latency 
+    seconds to respond after receiving a command. Responses are sent one at a time in the order the modules 
+    were addressed, and do not delay requests written while earlier commands are outstanding. Commands to 
+    module IDs that are not on the bus, or with an invalid frame, are not answered."""
+
+    def __init__(self, modules: dict, byte_time: float, command_latency: float, faults: list = None) -> None:
+        self.modules = modules
+        #faults applied to the next responses, see SimulatedFIU.inject_faults
+        self.faults = [] if faults is None else faults
+        self.byte_time = byte_time
+        self.command_latency = command_latency
+        self.timeout = None
+        self.is_open = True
+        self._lock = threading.Lock()
+        self._requests = FrameDecoder()
+        #(time the first byte arrives, response bytes) in the order the responses are sent
+        self._responses = []
+        #end of the last request sent by the host, and of the last response sent by a module
+        self._request_end = 0.0
+        self._response_end = 0.0
+
+    def reset_input_buffer(self) -> None:
+        with self._lock:
+            now = monotonic()
+            #drop everything received so far, responses still being sent keep arriving
+            self._responses = [(start, data[self.__arrived(start, data, now):]) for start, data in self._responses
+                               if self.__arrived(start, data, now) < len(data)]
+
+    def reset_output_buffer(self) -> None:
+        pass
+
+    def write(self, data: bytes) -> int:
+        with self._lock:
+            now = monotonic()
+            self._request_end = max(now, self._request_end) + len(data) * self.byte_time
+            self._requests.feed(data)
+            frame = self._requests.next_frame()
+            while frame is not None:
+                response = self.__respond(frame[:-1])
+                if response is not None and self.faults:
+                    fault = self.faults.pop(0)
+                    if fault == "drop":
+                        response = None
+                    elif fault == "corrupt":
+                        #change the last checksum digit
+                        response = response[:-2] + (b"1" if response[-2:-1] == b"0" else b"0") + b"\r"
+                if response is not None:
+                    #modules answer in the order addressed, each once the previous response has finished
+                    reply_start = max(self._request_end + self.command_latency, self._response_end)
+                    self._response_end = reply_start + len(response) * self.byte_time
+                    self._responses.append((reply_start, response))
+                frame = self._requests.next_frame()
+        return len(data)
+
+    @property
+    def in_waiting(self) -> int:
+        with self._lock:
+            now = monotonic()
+            return sum(self.__arrived(start, data, now) for start, data in self._responses)
+
+    def read(self, size: int = 1) -> bytes:
+        """Returns once size bytes have arrived, or the timeout expires"""
+        deadline = None if self.timeout is None else monotonic() + self.timeout
+        while True:
+            with self._lock:
+                now = monotonic()
+                available = sum(self.__arrived(start, data, now) for start, data in self._responses)
+                if available >= size or (deadline is not None and now >= deadline):
+                    return self.__take(min(size, available), now)
+                next_byte = self.__next_arrival()
+            wait = (next_byte if next_byte is not None else now + 0.001) - now
+            if deadline is not None:
+                wait = min(wait, deadline - now)
+            sleep(max(wait, 0))
+
+    def close(self) -> None:
+        self.is_open = False
+
+    def __arrived(self, start: float, data: bytes, now: float) -> int:
+        """Number of bytes of a response that have arrived"""
+        if now < start:
+            return 0
+        return min(len(data), int((now - start) / self.byte_time) + 1) if self.byte_time else len(data)
+
+    def __next_arrival(self) -> float:
+        """Time the next response byte arrives"""
+        now = monotonic()
+        for start, data in self._responses:
+            count = self.__arrived(start, data, now)
+            if count < len(data):
+                return start + count * self.byte_time
+        return None
+
+    def __take(self, size: int, now: float) -> bytes:
+        """Removes size arrived bytes from the responses"""
+        taken = bytearray()
+        while size and self._responses:
+            start, data = self._responses[0]
+            count = min(size, self.__arrived(start, data, now))
+            taken += data[:count]
+            size -= count
+            if count == len(data):
+                del self._responses[0]
+            else:
+                self._responses[0] = (start + count * self.byte_time, data[count:])
+        return bytes(taken)
+
+    def __respond(self, frame: bytes):
+        """Returns the response frame to a command frame, or None if no module answers"""
+        try:
+            msg = frame.decode('ascii')
+        except UnicodeDecodeError:
+            return None
+        length = COMMAND_LENGTHS.get(msg[:1])
+        if length is None or len(msg) <= length or not msg[1:2].isdigit():
+            return None
+        module = self.modules.get(int(msg[1]))
+        if module is None:
+            return None
+        cmd, crc = msg[:length], msg[length:]
+        try:
+            valid = int(crc, 16) == sum(frame[:length]) % 256
+        except ValueError:
+            valid = False
+        response = module.handle(cmd) if valid else b"2CRC Error"
+        return encode_response(response)
+
+
+class SimulatedFIU(RS485):
+    """RS485 interface connected to simulated FIU modules instead of a serial port, for hardware free testing.
+    The simulated modules speak the FIU wire protocol, with per-byte timing derived from the port settings 
+    baud rate (or byte_time seconds per byte, if given) and command_latency seconds of processing per command."""
+
+    def __init__(self, mod_ids: list = range(MODULE_COUNT), port_settings: DefaultPortSettings = DefaultPortSettings(),
+                 byte_time: float = None, command_latency: float = 0.0) -> None:
+        super().__init__("SIM", port_settings)
+        self.modules = {mod_id: SimulatedModule(mod_id) for mod_id in mod_ids}
+        #start, data, parity, and stop bits for each byte
+        self.byte_time = (1 + port_settings.byte_size + (port_settings.parity != 'N') + port_settings.stop_bits) \
+            / port_settings.baud_rate if byte_time is None else byte_time
+        self.command_latency = command_latency
+        self.faults = []
+
+    def inject_faults(self, *faults: str) -> None:
+        """Queues faults applied to the next responses in order. "drop" loses the response after the module 
+        has handled the command, "corrupt" changes a byte so the response fails checksum validation, and None 
+        leaves the response unchanged."""
+        self.faults.extend(faults)
+
+    def open(self) -> None:
+        """Connects to the simulated RS-485 bus."""
+        self.serial = SimulatedSerial(self.modules, self.byte_time, self.command_latency, self.faults)
+        self.serial.timeout = self._port_cfg.inter_byte_timeout
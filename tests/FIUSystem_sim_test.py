@@ -0,0 +1,52 @@
+import sys
+sys.path.append("src")
+from time import perf_counter
+from fiu import FIU, FIUState, FIUException, FIUSystem, SimulatedFIU
+
+def make_system(command_latency=0.0):
+    return FIUSystem({name: FIU([0, 1], name, SimulatedFIU([0, 1], command_latency=command_latency)) 
+                      for name in ("A", "B")})
+
+def test_shared_bus_across_chains():
+    with make_system() as system:
+        system.set_state("A", 0, 3, FIUState.VOLT_MEASUREMENT)
+        try:
+            system.set_state("B", 1, 5, FIUState.CURR_MEASUREMENT)
+        except FIUException as e:
+            assert e.code == 5012
+        else:
+            assert False, "second chain entered a DMM state"
+        assert system.bus_users == [("A", 0, 3, FIUState.VOLT_MEASUREMENT)]
+        #releasing the bus earlier in the same batch lets another chain take it
+        system.apply([("A", 0, 3, FIUState.CONNECTED), ("B", 1, 5, FIUState.FAULT_TO_GND)])
+        assert system.bus_users == [("B", 1, 5, FIUState.FAULT_TO_GND)]
+        assert system.chains["A"].relay_state(0)[2] == FIUState.CONNECTED
+        assert system.chains["B"].relay_state(1)[4] == FIUState.FAULT_TO_GND
+
+def test_invalid_batch_sends_nothing():
+    with make_system() as system:
+        try:
+            system.apply([("A", 0, 1, FIUState.DISCONNECTED), ("A", 0, 2, FIUState.VOLT_MEASUREMENT), 
+                          ("B", 0, 2, FIUState.VOLT_MEASUREMENT)])
+        except FIUException as e:
+            assert e.code == 5012
+        else:
+            assert False, "batch with two DMM users was applied"
+        assert system.chains["A"].relay_state(0)[0] == FIUState.CONNECTED
+        assert system.bus_users == []
+
+def test_chains_run_in_parallel():
+    with make_system(command_latency=0.02) as system:
+        changes = [(name, 0, channel, FIUState.DISCONNECTED) for channel in range(1, 9) for name in ("A", "B")]
+        start = perf_counter()
+        system.apply(changes)
+        elapsed = perf_counter() - start
+        #8 commands per chain, sequentially the two chains would take at least 0.32 seconds
+        assert elapsed < 0.3, elapsed
+        assert system.reconcile() == {"A": {0: [], 1: []}, "B": {0: [], 1: []}}
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: passed")
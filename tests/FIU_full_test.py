@@ -4,8 +4,8 @@ from fiu import FIU
 def print_states(rel_states: list) -> None:
     
     for i in range(0, 12):
-        space = "" if("MEASUREMENT" in rel_states[i]) else "\t"
-        print(f"Channel {i+1}:\t{rel_states[i]}\t{space}Channel {i+13}:\t{rel_states[i+12]}")
+        space = "" if("MEASUREMENT" in rel_states[i].name) else "\t"
+        print(f"Channel {i+1}:\t{rel_states[i].name}\t{space}Channel {i+13}:\t{rel_states[i+12].name}")
 
 if __name__ == "__main__":
     resource = sys.argv[1]
@@ -0,0 +1,312 @@
+import sys
+import threading
+sys.path.append("src")
+from time import monotonic, sleep
+from fiu import FIU, FIUState, FIUException, SimulatedFIU, DefaultPortSettings, RetryPolicy, CacheSettings, StateManager
+from fiu import FIUCommandError, FIUTimeoutError
+
+def test_relay_state():
+    with FIU([0, 1], "SIM", SimulatedFIU([0, 1])) as fiu:
+        fiu.set_open_circuit_fault(0, 1, True)
+        fiu.set_short_circuit_fault(1, 24)
+        assert fiu.relay_state(0)[0] == FIUState.DISCONNECTED
+        assert fiu.relay_state(1)[23] == FIUState.FAULT_TO_GND
+        assert fiu.reconcile() == {0: [], 1: []}
+
+def test_short_relay_state_reply():
+    sim = SimulatedFIU([0, 1])
+    with FIU([0, 1], "SIM", sim) as fiu:
+        fiu.set_short_circuit_fault(1, 24)
+        #the reply passes checksum validation but is missing channels 6-24
+        handle = sim.modules[0].handle
+        sim.modules[0].handle = lambda cmd: handle(cmd)[:6] if cmd[0] == "S" else handle(cmd)
+        assert fiu.relay_state(0) == [FIUState.CONNECTED] * 5 + [FIUState.RESET] * 19
+        #the other modules' states are not shifted
+        assert fiu.relay_state(1, cached=True)[23] == FIUState.FAULT_TO_GND
+        assert fiu.bus_users() == [(1, 24, FIUState.FAULT_TO_GND)]
+        try:
+            StateManager([0]).load_module_state(0, [FIUState.CONNECTED] * 5)
+        except ValueError:
+            pass
+        else:
+            assert False, "expected a wrong length state list to be rejected"
+
+def test_cache_limits():
+    sim = SimulatedFIU([0])
+    with FIU([0], "SIM", sim) as fiu:
+        metrics = fiu.enable_metrics()
+        fiu.configure_cache(CacheSettings(enabled=True, max_age=0.05))
+        fiu.relay_state(0)
+        fiu.relay_state(0)
+        assert metrics.commands["S"] == 1
+        sleep(0.06)
+        fiu.relay_state(0)
+        assert metrics.commands["S"] == 2
+        fiu.configure_cache(CacheSettings(enabled=True, max_writes=2))
+        fiu.set_open_circuit_fault(0, 1)
+        assert fiu.relay_state(0)[0] == FIUState.DISCONNECTED
+        assert metrics.commands["S"] == 2
+        fiu.set_open_circuit_fault(0, 2)
+        fiu.relay_state(0)
+        assert metrics.commands["S"] == 3
+        #reading the module back from hardware restarts the count
+        fiu.relay_state(0)
+        assert metrics.commands["S"] == 3
+
+def test_queries():
+    with FIU([3], "SIM", SimulatedFIU([3])) as fiu:
+        assert fiu.software_version(3) == "SIM 1.1.0"
+        fiu.interlock_override(3, True)
+        assert fiu.interlock_state(3)
+
+def test_snapshot_diff():
+    with FIU([0, 2], "SIM", SimulatedFIU([0, 2])) as fiu:
+        before = fiu.snapshot()
+        fiu.set_voltage_measurement(2, 4)
+        fiu.interlock_override(0, True)
+        after = fiu.snapshot()
+        assert after.module_state(2)[3] == FIUState.VOLT_MEASUREMENT
+        assert before.diff(after) == [(0, "interlock", False, True), 
+                                      (2, 4, FIUState.CONNECTED, FIUState.VOLT_MEASUREMENT)]
+        assert after.diff(fiu.snapshot()) == []
+
+def test_monitor_detects_power_cycle():
+    sim = SimulatedFIU([0])
+    changes = []
+    with FIU([0], "SIM", sim) as fiu:
+        fiu.start_monitor(0.01, on_change=lambda mod_id, diff: changes.append((mod_id, len(diff))))
+        sim.modules[0].power_cycle()
+        start = monotonic()
+        while not changes and monotonic() - start < 1:
+            sleep(0.01)
+        fiu.stop_monitor()
+        assert changes == [(0, 24)]
+        assert fiu.relay_state(0, cached=True) == [FIUState.RESET] * 24
+
+def test_monitor_callbacks_run_unlocked():
+    sim = SimulatedFIU([0])
+    errors = []
+    with FIU([0], "SIM", sim) as fiu:
+        changed = threading.Event()
+        def slow_callback(mod_id, diff):
+            changed.set()
+            sleep(0.2)
+        fiu.start_monitor(0.01, on_change=slow_callback, on_error=lambda mod_id, e: errors.append(e))
+        sim.modules[0].power_cycle()
+        assert changed.wait(1)
+        #a foreground command is not held up by the callback
+        start = monotonic()
+        fiu.software_version(0)
+        assert monotonic() - start < 0.1
+        fiu.stop_monitor()
+    #a callback may disconnect the FIU, which stops the monitor it is running on
+    sim = SimulatedFIU([0])
+    fiu = FIU([0], "SIM", sim)
+    fiu.connect()
+    disconnected = threading.Event()
+    def disconnect(mod_id, diff):
+        fiu.disconnect()
+        disconnected.set()
+    monitor = fiu.start_monitor(0.01, on_change=disconnect, on_error=lambda mod_id, e: errors.append(e))
+    sim.modules[0].power_cycle()
+    assert disconnected.wait(1)
+    monitor._thread.join(1)
+    assert not monitor._thread.is_alive()
+    assert errors == [] and not sim.serial.is_open
+
+def test_multi_short_error():
+    sim = SimulatedFIU([0])
+    with FIU([0], "SIM", sim) as fiu:
+        fiu.set_voltage_measurement(0, 1)
+        #bypass the driver's state manager to reach the module's own protection
+        try:
+            sim.write_cmd("F002")
+        except FIUCommandError as e:
+            assert e.code == 5004 and not e.retryable
+        else:
+            assert False, "expected an error response"
+
+def test_missing_module_times_out():
+    sim = SimulatedFIU([0], DefaultPortSettings(response_timeout=0.05))
+    fiu = FIU([0, 1], "SIM", sim)
+    fiu.connect()
+    try:
+        fiu.relay_state(1)
+    except FIUException as e:
+        assert e.code == 5001
+    else:
+        assert False, "expected a timeout"
+    sim.close()
+
+def test_invalid_batch_sends_nothing():
+    sim = SimulatedFIU([0])
+    with FIU([0], "SIM", sim) as fiu:
+        metrics = fiu.enable_metrics()
+        for changes, code in (([(0, 1, FIUState.DISCONNECTED), (0, 2, FIUState.VOLT_MEASUREMENT), (0, 3, FIUState.FAULT_TO_GND)], 5010),
+                              ([(0, 1, FIUState.DISCONNECTED), (0, 25, FIUState.DISCONNECTED)], 5051),
+                              ([(0, 1, FIUState.DISCONNECTED), (0, 2, FIUState.RESET)], 5011)):
+            try:
+                fiu.apply(changes)
+            except FIUException as e:
+                assert e.code == code
+            else:
+                assert False, "expected the batch to be rejected"
+        assert metrics.commands == {}
+        assert sim.modules[0].states == [FIUState.CONNECTED] * 24
+
+def test_failed_batch_rolled_back():
+    sim = SimulatedFIU([0], DefaultPortSettings(response_timeout=0.05))
+    with FIU([0], "SIM", sim) as fiu:
+        fiu.set_open_circuit_fault(0, 4)
+        #the third command is handled by the module but all of its responses are lost
+        sim.inject_faults(None, None, "drop", "drop", "drop")
+        try:
+            fiu.apply([(0, 1, FIUState.DISCONNECTED), (0, 4, FIUState.CONNECTED), (0, 3, FIUState.VOLT_MEASUREMENT)])
+        except FIUTimeoutError:
+            pass
+        else:
+            assert False, "expected a timeout"
+        expected = [FIUState.CONNECTED] * 24
+        expected[3] = FIUState.DISCONNECTED
+        assert sim.modules[0].states == expected
+        assert fiu.relay_state(0, cached=True) == expected
+        #the state manager still allows the channel onto the bus
+        fiu.set_voltage_measurement(0, 3)
+
+def test_lost_restore_keeps_bus_safe():
+    sim = SimulatedFIU([0, 1], DefaultPortSettings(response_timeout=0.05))
+    with FIU([0, 1], "SIM", sim) as fiu:
+        fiu.configure(shared_dmm=True)
+        fiu.configure_retry(RetryPolicy(retries=0))
+        fiu.set_voltage_measurement(0, 1)
+        #module 1 faults channel 2 to ground but the response is lost, then the restore never reaches the module
+        handle, lost = sim.modules[1].handle, ["C102"]
+        def lossy_handle(cmd):
+            if cmd in lost:
+                lost.remove(cmd)
+                return b"0"
+            return handle(cmd)
+        sim.modules[1].handle = lossy_handle
+        sim.inject_faults(None, "drop", "drop")
+        try:
+            fiu.apply([(0, 1, FIUState.CONNECTED), (1, 2, FIUState.FAULT_TO_GND)])
+        except FIUTimeoutError:
+            pass
+        else:
+            assert False, "expected a timeout"
+        #channel 1 is not put back on the shared bus while channel 2 may still be using it
+        assert sim.modules[0].states[0] == FIUState.CONNECTED
+        assert sim.modules[1].states[1] == FIUState.FAULT_TO_GND
+        assert fiu.bus_users() == [(1, 2, FIUState.FAULT_TO_GND)]
+
+def test_transaction():
+    sim = SimulatedFIU([0])
+    with FIU([0], "SIM", sim) as fiu:
+        try:
+            with fiu.transaction() as transaction:
+                transaction.set_state(0, 1, FIUState.DISCONNECTED).set_state(0, 2, FIUState.FAULT_TO_GND)
+                raise RuntimeError("test step failed")
+        except RuntimeError:
+            pass
+        assert sim.modules[0].states == [FIUState.CONNECTED] * 24
+        with fiu.transaction() as transaction:
+            transaction.set_state(0, 1, FIUState.DISCONNECTED).set_state(0, 2, FIUState.FAULT_TO_GND)
+        assert sim.modules[0].states[:3] == [FIUState.DISCONNECTED, FIUState.FAULT_TO_GND, FIUState.CONNECTED]
+
+def test_retry_corrupted_and_lost_responses():
+    sim = SimulatedFIU([0], DefaultPortSettings(response_timeout=0.05))
+    with FIU([0], "SIM", sim) as fiu:
+        sim.inject_faults("corrupt", "drop")
+        fiu.set_voltage_measurement(0, 1)
+        assert fiu.relay_state(0)[0] == FIUState.VOLT_MEASUREMENT
+        #the command is handled but every response is lost, so the module's state is read back
+        sim.inject_faults("drop", "drop", "drop")
+        try:
+            fiu.set_open_circuit_fault(0, 5)
+        except FIUTimeoutError as e:
+            assert e.code == 5001
+        else:
+            assert False, "expected a timeout"
+        assert fiu.relay_state(0, cached=True)[4] == FIUState.DISCONNECTED
+
+def test_retry_budget():
+    sim = SimulatedFIU([0], DefaultPortSettings(response_timeout=0.02))
+    with FIU([0], "SIM", sim) as fiu:
+        fiu.configure_retry(RetryPolicy(retries=3, budget=4, resync=False))
+        sim.inject_faults(*["drop"] * 6)
+        for expected in (3, 1):
+            sent = len(sim.faults)
+            try:
+                fiu.software_version(0)
+            except FIUTimeoutError:
+                assert sent - len(sim.faults) == expected + 1
+            else:
+                assert False, "expected a timeout"
+        #a command that succeeds on its first attempt restores the budget
+        assert fiu.software_version(0) == "SIM 1.1.0" and fiu._retries_used == 0
+
+def test_metrics():
+    sim = SimulatedFIU([0], DefaultPortSettings(response_timeout=0.05))
+    with FIU([0], "SIM", sim) as fiu:
+        records = []
+        metrics = fiu.enable_metrics(records.append)
+        fiu.set_open_circuit_fault(0, 1)
+        #each failed attempt is counted, then retried
+        sim.inject_faults("corrupt")
+        fiu.set_open_circuit_fault(0, 2)
+        sim.inject_faults("drop")
+        fiu.relay_state(0)
+        assert [(record.opcode, record.error) for record in records] == \
+            [("D", None), ("D", 5005), ("D", None), ("S", 5001), ("S", None)]
+        assert metrics.commands == {"D": 3, "S": 2}
+        assert metrics.crc_errors == 1 and metrics.timeouts == 1
+        assert metrics.return_codes == {"0": 2, "1": 1}
+        #D commands are 7 bytes and S queries 5, the corrupted D response is counted but the lost S response never arrived
+        assert metrics.bytes_sent == 3 * 7 + 2 * 5
+        assert [record.bytes_received for record in records] == [4, 4, 4, 0, 28]
+        assert metrics.bytes_received == 3 * 4 + 28
+        assert metrics.latency["D"]["frame"].count == 2 and metrics.latency["S"]["write"].count == 2
+        snapshot = fiu.metrics()
+        assert snapshot["commands"] == metrics.commands and snapshot["timeouts"] == 1
+        fiu.disable_metrics()
+        fiu.software_version(0)
+        assert fiu.metrics() is None
+        assert len(records) == 5 and metrics.commands == {"D": 3, "S": 2}
+    #a response still arriving when the command times out counts the bytes received so far
+    sim = SimulatedFIU([0], DefaultPortSettings(response_timeout=0.1), byte_time=0.01)
+    with FIU([0], "SIM", sim, reset_on_exit=False) as fiu:
+        fiu.configure_retry(RetryPolicy(retries=0, resync=False))
+        records = []
+        metrics = fiu.enable_metrics(records.append)
+        try:
+            fiu.relay_state(0)
+        except FIUTimeoutError:
+            pass
+        else:
+            assert False, "expected a timeout"
+        assert metrics.timeouts == 1 and 0 < metrics.bytes_received == records[0].bytes_received < 28
+
+def test_bus_timing():
+    #8 modules at 115200 baud with 2 ms of processing per command
+    sim = SimulatedFIU(command_latency=0.002)
+    with FIU(list(range(8)), "SIM", sim) as fiu:
+        start = monotonic()
+        for channel in range(1, 25):
+            fiu.set_open_circuit_fault(channel % 8, channel)
+        elapsed = monotonic() - start
+        #7 byte commands and 3 byte responses take ~0.87 ms on the wire
+        assert 24 * 0.0028 < elapsed < 24 * 0.01
+
+def test_pipelined_reset():
+    sim = SimulatedFIU(port_settings=DefaultPortSettings(pipeline_depth=8), command_latency=0.02)
+    with FIU(list(range(8)), "SIM", sim) as fiu:
+        start = monotonic()
+        fiu.connect_channels_all()
+        #module processing overlaps, so all 8 commands take about one round trip
+        assert monotonic() - start < 2 * 0.02
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: passed")
@@ -0,0 +1,55 @@
+import sys
+sys.path.append("src")
+from timeit import repeat
+from fiu.fiu_types import FIUState, StateManager
+
+class LegacyStateManager(object):
+    """List backed state registry from driver v1.1.0, kept as the baseline for the check benchmarks"""
+    def __init__(self, box_ids: list):
+        self._boxIDs = box_ids
+        self.registry = {"%d" % id: [FIUState.CONNECTED]*24 for id in box_ids}
+
+    def check_transition(self, mod_id: int, channel: int, next_state: FIUState) -> bool:
+        chan = channel - 1
+        module_states = self.registry["%d" % mod_id]
+        if(FIUState.VOLT_MEASUREMENT <= next_state <= FIUState.FAULT_TO_GND):
+            check = []
+            i = 0
+            for state in module_states:
+                if(i is not chan):
+                    check.append(state in range(FIUState.VOLT_MEASUREMENT, FIUState.FAULT_TO_GND + 1))
+            return not any(check)
+        return True
+
+    def check_shared_DMM_transition(self, next_state: FIUState) -> bool:
+        #v1.1.0 raised a TypeError building the system state list, this is the intended behavior
+        if(FIUState.VOLT_MEASUREMENT <= next_state <= FIUState.FAULT_TO_GND):
+            check = []
+            for id in self._boxIDs:
+                for state in self.registry["%d" % id]:
+                    check.append(state in range(FIUState.VOLT_MEASUREMENT, FIUState.FAULT_TO_GND + 1))
+            return not any(check)
+        return True
+
+def per_call_ns(func, number: int = 20000) -> float:
+    """Best per-call time in nanoseconds over 5 runs"""
+    return min(repeat(func, number=number, repeat=5)) / number * 1e9
+
+if __name__ == "__main__":
+    modules = list(range(8))
+    legacy = LegacyStateManager(modules)
+    current = StateManager(modules)
+    current.set_all_state(modules, FIUState.CONNECTED)
+
+    rows = [
+        ("check_transition", 
+         lambda: legacy.check_transition(3, 12, FIUState.VOLT_MEASUREMENT),
+         lambda: current.check_transition(3, 12, FIUState.VOLT_MEASUREMENT)),
+        ("check_shared_DMM_transition", 
+         lambda: legacy.check_shared_DMM_transition(FIUState.FAULT_TO_GND),
+         lambda: current.check_shared_DMM_transition(FIUState.FAULT_TO_GND, 3, 12)),
+    ]
+    print(f"{'Check':<30}{'Before (ns)':>14}{'After (ns)':>14}{'Speedup':>10}")
+    for name, before, after in rows:
+        b, a = per_call_ns(before), per_call_ns(after)
+        print(f"{name:<30}{b:>14.0f}{a:>14.0f}{b/a:>9.1f}x")
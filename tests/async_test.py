@@ -0,0 +1,95 @@
+import asyncio
+import sys
+import threading
+sys.path.append("src")
+from time import perf_counter
+from fiu import AsyncFIU, AsyncRS485, FIUException, FIUState, RetryPolicy, SimulatedFIU
+
+LATENCY = 0.02
+COMMANDS = 5
+
+class TrackedSimulatedFIU(SimulatedFIU):
+    """SimulatedFIU recording the most commands that were ever in flight at once"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._count_lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def write_frame(self, frame, timeout=None):
+        with self._count_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return super().write_frame(frame, timeout)
+        finally:
+            with self._count_lock:
+                self.in_flight -= 1
+
+async def sweep(fiu, mod_id):
+    for channel in range(1, COMMANDS + 1):
+        await fiu.set_open_circuit_fault(mod_id, channel)
+
+def test_separate_buses_run_concurrently():
+    async def main():
+        buses = [AsyncRS485(f"SIM{i}", interface=SimulatedFIU([0], command_latency=LATENCY)) for i in range(2)]
+        fius = [AsyncFIU([0], bus.resource, bus) for bus in buses]
+        for fiu in fius:
+            await fiu.connect()
+        start = perf_counter()
+        await asyncio.gather(*(sweep(fiu, 0) for fiu in fius))
+        elapsed = perf_counter() - start
+        for fiu in fius:
+            assert (await fiu.relay_state(0))[:COMMANDS] == [FIUState.DISCONNECTED] * COMMANDS
+            await fiu.disconnect()
+        return elapsed
+    #one bus alone takes at least COMMANDS * LATENCY, both buses one after the other twice that
+    assert asyncio.run(main()) < 1.8 * COMMANDS * LATENCY
+
+def test_shared_bus_is_serialized():
+    async def main():
+        sim = TrackedSimulatedFIU([0, 1], command_latency=LATENCY)
+        bus = AsyncRS485("SIM", interface=sim)
+        fius = [AsyncFIU([mod_id], "SIM", bus) for mod_id in (0, 1)]
+        await fius[0].connect()
+        start = perf_counter()
+        await asyncio.gather(sweep(fius[0], 0), sweep(fius[1], 1))
+        elapsed = perf_counter() - start
+        assert sim.max_in_flight == 1
+        assert sim.modules[1].states[:COMMANDS] == [FIUState.DISCONNECTED] * COMMANDS
+        await fius[0].disconnect()
+        return elapsed
+    assert asyncio.run(main()) >= 2 * COMMANDS * LATENCY
+
+def test_batch_methods():
+    async def main():
+        async with AsyncFIU([0], "SIM", AsyncRS485("SIM", interface=SimulatedFIU([0]))) as fiu:
+            changes = await fiu.validate([(0, 2, 3)])
+            assert changes == [(0, 2, FIUState.VOLT_MEASUREMENT)]
+            assert await fiu.compare_and_set(0, 2, FIUState.CONNECTED, FIUState.VOLT_MEASUREMENT)
+            assert not await fiu.compare_and_set(0, 2, FIUState.CONNECTED, FIUState.CURR_MEASUREMENT)
+            assert await fiu.bus_users() == [(0, 2, FIUState.VOLT_MEASUREMENT)]
+    asyncio.run(main())
+
+def test_configure_retry():
+    async def main():
+        sim = SimulatedFIU([0])
+        async with AsyncFIU([0], "SIM", AsyncRS485("SIM", interface=sim)) as fiu:
+            fiu.configure_retry(RetryPolicy(retries=0, resync=False))
+            sim.inject_faults("drop")
+            try:
+                await fiu.set_open_circuit_fault(0, 1)
+                assert False, "a dropped response must fail without retries"
+            except FIUException as e:
+                assert e.code == 5001
+            fiu.configure_retry(RetryPolicy(retries=1, resync=False))
+            sim.inject_faults("drop")
+            await fiu.set_open_circuit_fault(0, 1)
+            assert sim.modules[0].states[0] == FIUState.DISCONNECTED
+    asyncio.run(main())
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: passed")
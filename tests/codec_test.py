@@ -0,0 +1,44 @@
+import sys
+sys.path.append("src")
+from fiu.codec import *
+
+def test_encode_command():
+    buf = bytearray()
+    assert encode_command(buf, "F012") == b"F012D9\r"
+    #the buffer is reused for the next command
+    assert encode_command(buf, b"S0") is buf and buf == b"S0" + b"%X" % (ord("S") + ord("0")) + b"\r"
+    assert add_CRC(b"F012") == b"F012D9\r"
+
+def test_verify_response():
+    frame = encode_response(b"1CDVIF")
+    assert verify_response(frame)
+    assert verify_response(memoryview(frame))
+    assert bytes(response_data(frame)) == b"CDVIF"
+    assert not verify_response(frame[:-3] + b"00\r")
+    assert not verify_response(b"0\r")
+
+def test_partial_and_concatenated_frames():
+    first, second = encode_response(b"0"), encode_response(b"1SIM 1.1.0")
+    decoder = FrameDecoder()
+    stream = first + second
+    #feed one byte at a time, frames come out once their terminator arrives
+    frames = []
+    for i in range(len(stream)):
+        decoder.feed(stream[i:i + 1])
+        frame = decoder.next_frame()
+        if frame is not None:
+            frames.append(frame)
+    assert frames == [first, second] and len(decoder) == 0
+    #several frames and a partial frame in a single chunk
+    decoder.feed(first + second + second[:4])
+    assert decoder.next_frame() == first
+    assert decoder.next_frame() == second
+    assert decoder.next_frame() is None and decoder.pending() == second[:4]
+    decoder.feed(second[4:])
+    assert decoder.next_frame() == second
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: passed")
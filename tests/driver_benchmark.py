@@ -0,0 +1,109 @@
+"""Hardware free benchmarks of the driver hot paths over simulated FIU modules.
+
+Usage: python tests/driver_benchmark.py [--save FILE] [--compare FILE] [--tolerance 0.5]
+
+Reports calls per second and peak bytes allocated per call for each benchmark. --save writes the results
+to a JSON file, and --compare exits with an error if any benchmark is slower than a saved baseline by more 
+than the tolerance."""
+import sys
+sys.path.append("src")
+import argparse
+import json
+import tracemalloc
+from timeit import repeat
+from fiu import FIU, FIUState, SimulatedFIU
+from fiu.fiu_types import StateManager, RELAY_STATE_TABLE
+from fiu.frames import QUERY_FRAMES
+from fiu.codec import FrameDecoder, add_CRC, encode_response, verify_response
+
+def sim_fiu(mod_ids: list) -> FIU:
+    """FIU on simulated modules that answer without any wire or processing time"""
+    fiu = FIU(mod_ids, "SIM", SimulatedFIU(mod_ids, byte_time=0))
+    fiu.interface.open()
+    return fiu
+
+def calls_per_second(func, number: int) -> float:
+    """Best rate over 5 runs"""
+    return number / min(repeat(func, number=number, repeat=5))
+
+def peak_bytes(func) -> int:
+    """Peak bytes allocated while making a single call, after a warm up call"""
+    func()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+def benchmarks() -> list:
+    """Returns (name, function, calls per run) for every benchmark"""
+    fiu = sim_fiu([0])
+    iface = fiu.interface
+    status_frame = encode_response(b"1" + b"CDVIF" * 4 + b"CCCC")
+    mgr = StateManager(list(range(8)))
+    mgr.set_all_state(list(range(8)), FIUState.CONNECTED)
+    status = status_frame[1:-3]
+
+    decoder = FrameDecoder()
+    def decode_frames():
+        decoder.feed(status_frame + status_frame)
+        decoder.next_frame()
+        decoder.next_frame()
+
+    def set_fault():
+        fiu.set_short_circuit_fault(0, 12)
+        fiu.set_channel_connected(0, 12)
+
+    rows = [
+        ("add_CRC", lambda: add_CRC(b"F012"), 100000),
+        ("verify_response", lambda: verify_response(status_frame), 100000),
+        ("FrameDecoder (2 frames)", decode_frames, 100000),
+        ("RS485.write_frame (S query)", lambda: iface.write_frame(QUERY_FRAMES["S"][0]), 10000),
+        ("check_transition", lambda: mgr.check_transition(3, 12, FIUState.VOLT_MEASUREMENT), 100000),
+        ("check_shared_DMM_transition", lambda: mgr.check_shared_DMM_transition(FIUState.FAULT_TO_GND, 3, 12), 100000),
+        ("relay_state decode", lambda: [RELAY_STATE_TABLE[stat] for stat in status], 100000),
+        ("FIU.set_* (2 commands)", set_fault, 10000),
+        ("FIU.relay_state", lambda: fiu.relay_state(0), 10000),
+    ]
+    #scaling of the all-module and whole system operations with the number of modules on the bus
+    for count in (1, 2, 4, 8):
+        scaled = sim_fiu(list(range(count)))
+        rows.append((f"connect_channels_all ({count} modules)", scaled.connect_channels_all, 2000))
+        rows.append((f"snapshot ({count} modules)", scaled.snapshot, 1000))
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save", help="write the results to a JSON file")
+    parser.add_argument("--compare", help="compare the results to a JSON file saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown fraction when comparing")
+    args = parser.parse_args()
+
+    baseline = dict()
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = dict()
+    regressions = []
+    print(f"{'Benchmark':<36}{'Calls/s':>14}{'Peak B/call':>13}{'Change':>10}")
+    for name, func, number in benchmarks():
+        rate = calls_per_second(func, number)
+        alloc = peak_bytes(func)
+        results[name] = {"calls_per_second": rate, "peak_bytes": alloc}
+        change = ""
+        if name in baseline:
+            ratio = rate / baseline[name]["calls_per_second"]
+            change = f"{ratio - 1:+.0%}"
+            if ratio < 1 - args.tolerance:
+                regressions.append(name)
+        print(f"{name:<36}{rate:>14,.0f}{alloc:>13,}{change:>10}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if regressions:
+        print(f"\nRegressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
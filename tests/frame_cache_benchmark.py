@@ -0,0 +1,33 @@
+import sys
+sys.path.append("src")
+from timeit import repeat
+from fiu import FIU, FIUState, SimulatedFIU
+from fiu.frames import CHANNEL_FRAMES
+
+def legacy_frame(mod_id: int, channel: int) -> bytes:
+    """Per call command string building and CRC from driver v1.1.0"""
+    msg = f"F{mod_id}{channel:02d}"
+    CRC = hex(sum(bytes(msg, 'utf-8')) % 256)[2:].upper()
+    return (msg + CRC + '\r').encode('utf-8')
+
+def frames_per_second(func, number: int = 20000) -> float:
+    """Best rate over 5 runs"""
+    return number / min(repeat(func, number=number, repeat=5))
+
+if __name__ == "__main__":
+    fiu = FIU([0], "SIM", SimulatedFIU([0], byte_time=0))
+    fiu.interface.open()
+    fault_frames = CHANNEL_FRAMES[FIUState.FAULT_TO_GND]
+
+    def set_fault():
+        fiu.set_short_circuit_fault(0, 12)
+        fiu.set_channel_connected(0, 12)
+
+    rows = [
+        ("frame build (v1.1.0)", lambda: legacy_frame(0, 12), 1),
+        ("frame lookup", lambda: fault_frames[0][12], 1),
+        ("FIU.set_* round trip", set_fault, 2),
+    ]
+    print(f"{'Path':<24}{'Frames/s':>14}")
+    for name, func, frames in rows:
+        print(f"{name:<24}{frames * frames_per_second(func):>14,.0f}")
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+from statistics import median
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+
+#worker process code for a state/validation only import and for the full driver
+LIGHT_IMPORT = "import fiu; fiu.FIUState; fiu.StateManager; fiu.FIUTimeoutError"
+FULL_IMPORT = "import fiu; fiu.FIU; fiu.AsyncFIU; fiu.FIUSession"
+HEAVY_MODULES = ("serial", "asyncio", "multiprocessing", "fiu.interfaces", "fiu.driver")
+
+def run_python(code, *options):
+    env = dict(os.environ, PYTHONPATH=SRC)
+    result = subprocess.run([sys.executable, *options, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return result
+
+def loaded_modules(code):
+    """Returns the heavy modules present in sys.modules after running code in a fresh interpreter"""
+    check = f"{code}; import sys; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    return run_python(check).stdout.split()
+
+def import_time(code):
+    """Returns the cumulative import time in microseconds reported by -X importtime for the fiu package"""
+    total = 0
+    for line in run_python(code, "-X", "importtime").stderr.splitlines():
+        fields = line.split("|")
+        #only count top level imports, their cumulative time already includes nested imports
+        if len(fields) == 3 and fields[1].strip().isdigit() and not fields[2].startswith("  "):
+            total += int(fields[1])
+    return total
+
+def test_state_import_is_lightweight():
+    assert loaded_modules(LIGHT_IMPORT) == []
+
+def test_lazy_exports():
+    assert set(loaded_modules(FULL_IMPORT)) >= {"asyncio", "fiu.driver", "fiu.interfaces"}
+    #pyserial is only imported once a port is opened
+    assert "serial" not in loaded_modules(FULL_IMPORT)
+    run_python("from fiu import *; SimulatedFIU; FIUState; FIUTimeoutError; FIUChecksumError; FIUResponseError; FIUCommandError")
+
+def benchmark(repeat=10):
+    for label, code in (("interpreter", "pass"), ("state model", LIGHT_IMPORT), ("full driver", FULL_IMPORT)):
+        times = [import_time(code) for _ in range(repeat)]
+        print(f"{label:12}: median import time {median(times) / 1000:.2f} ms over {repeat} runs")
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: passed")
+    benchmark()
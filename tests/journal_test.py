@@ -0,0 +1,96 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+sys.path.append("src")
+from time import perf_counter
+from fiu import AsyncFIU, AsyncRS485, DefaultPortSettings, FIU, FIUState, SimulatedFIU, read_journal
+from fiu.codec import response_data
+from fiu.journal import *
+
+def test_journal_records_frames():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "fiu.journal")
+        with FIU([0, 1], "SIM", SimulatedFIU([0, 1])) as fiu:
+            fiu.enable_journal(path)
+            fiu.set_voltage_measurement(0, 2)
+            fiu.snapshot()
+            fiu.disable_journal()
+        records = read_journal(path)
+        assert [record.direction for record in records[:2]] == [JOURNAL_SENT, JOURNAL_RECEIVED]
+        assert records[0].frame == b"V002" + b"%X" % sum(b"V002") + b"\r"
+        assert len(records) == 14 and records[-1].frame[0:1] == b"1"
+        assert all(a.timestamp <= b.timestamp for a, b in zip(records, records[1:]))
+        #reopening a journal appends to it, growing the file when it is full
+        with CommandJournal(path) as journal:
+            for _ in range(GROW_RECORDS):
+                journal.append(JOURNAL_SENT, b"S0")
+        assert len(read_journal(path)) == 14 + GROW_RECORDS
+
+def test_replay_against_simulator():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "fiu.journal")
+        with FIU([0], "SIM", SimulatedFIU([0])) as fiu:
+            fiu.enable_journal(path)
+            fiu.set_short_circuit_fault(0, 7)
+            fiu.set_open_circuit_fault(0, 8)
+            fiu.relay_state(0)
+            fiu.disable_journal()
+        sim = SimulatedFIU([0])
+        sim.open()
+        results = replay(path, sim, speed=None)
+        assert len(results) == 3
+        for frame, recorded, replayed in results:
+            assert replayed == bytes(response_data(recorded))
+        assert sim.write_cmd("S0")[6:8] == "FD"
+
+def test_async_journal():
+    async def main(path):
+        sim = SimulatedFIU([0], DefaultPortSettings(response_timeout=0.05))
+        async with AsyncFIU([0], "SIM", AsyncRS485("SIM", interface=sim)) as fiu:
+            #enabling the journal waits for the bus without blocking the event loop
+            sim.inject_faults("drop", "drop")
+            command = asyncio.ensure_future(fiu.software_version(0))
+            await asyncio.sleep(0)
+            gaps = []
+            async def ticker():
+                last = perf_counter()
+                while not command.done():
+                    await asyncio.sleep(0.005)
+                    gaps.append(perf_counter() - last)
+                    last = perf_counter()
+            await asyncio.gather(fiu.enable_journal(path), ticker())
+            await command
+            assert max(gaps) < 0.05
+            await fiu.set_open_circuit_fault(0, 2)
+            await fiu.disable_journal()
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "fiu.journal")
+        asyncio.run(main(path))
+        assert [record.direction for record in read_journal(path)] == [JOURNAL_SENT, JOURNAL_RECEIVED]
+
+def test_toggle_journal_during_commands():
+    errors = []
+    stop = threading.Event()
+    with tempfile.TemporaryDirectory() as folder, FIU([0], "SIM", SimulatedFIU([0])) as fiu:
+        def commands():
+            try:
+                while not stop.is_set():
+                    fiu.relay_state(0)
+            except BaseException as e:
+                errors.append(e)
+        thread = threading.Thread(target=commands)
+        thread.start()
+        for i in range(50):
+            fiu.enable_journal(os.path.join(folder, f"{i % 2}.journal"))
+            fiu.disable_journal()
+        stop.set()
+        thread.join()
+    assert errors == []
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: passed")
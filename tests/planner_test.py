@@ -0,0 +1,62 @@
+import sys
+sys.path.append("src")
+from fiu import FIU, FIUState, FIUException, SimulatedFIU, DefaultPortSettings, CampaignPlanner
+from fiu.fiu_types import BUS_STATES, CHANNEL_COUNT
+
+FAULTS = (FIUState.DISCONNECTED, FIUState.VOLT_MEASUREMENT, FIUState.CURR_MEASUREMENT, FIUState.FAULT_TO_GND)
+
+def test_full_campaign_frame_count():
+    summary = CampaignPlanner(range(8)).summary()
+    assert summary["points"] == 8 * 24 * 4
+    #one baseline broadcast per module, then one frame per test point and one to restore each channel,
+    #against 2 frames per test point with a set_* and set_channel_connected call for each
+    assert summary["frames"] == 8 + 8 * 24 * 5 < 2 * summary["points"]
+    #modules are swept together, so each stage is pipelined across all 8 modules
+    assert summary["stages"] == 1 + 24 * 4
+
+def test_every_point_is_isolated():
+    for shared_dmm in (False, True):
+        planner = CampaignPlanner([0, 3], channels=[1, 2, 24], shared_dmm=shared_dmm)
+        states = bytearray(8 * CHANNEL_COUNT)
+        seen = []
+        for stage in planner.stages():
+            for mod_id, channel, state in stage.changes:
+                states[mod_id * CHANNEL_COUNT + channel - 1] = state
+            bus = [index for index, state in enumerate(states) if BUS_STATES[state]]
+            assert len(bus) <= (1 if shared_dmm else 2)
+            for mod_id, channel, state in stage.points:
+                module = states[mod_id * CHANNEL_COUNT:(mod_id + 1) * CHANNEL_COUNT]
+                assert module[channel - 1] == state
+                assert module.count(FIUState.CONNECTED) == CHANNEL_COUNT - 1
+                seen.append((mod_id, channel, state))
+        assert sorted(seen) == sorted((mod_id, channel, fault) for mod_id in (0, 3) for channel in (1, 2, 24) for fault in FAULTS)
+        assert states[:CHANNEL_COUNT] == bytes((FIUState.CONNECTED,)) * CHANNEL_COUNT
+
+def test_unsafe_initial_state_rejected():
+    initial = bytearray((FIUState.CONNECTED,)) * (8 * CHANNEL_COUNT)
+    initial[0] = initial[1] = FIUState.VOLT_MEASUREMENT
+    try:
+        CampaignPlanner([0], channels=[5]).plan(initial)
+    except FIUException as e:
+        assert e.code == 5010
+    else:
+        assert False, "expected an unsafe state error"
+
+def test_run_campaign():
+    sim = SimulatedFIU([0, 1], DefaultPortSettings(pipeline_depth=2))
+    with FIU([0, 1], "SIM", sim) as fiu:
+        fiu.configure(shared_dmm=True)
+        fiu.set_open_circuit_fault(1, 7)
+        points = 0
+        for stage in CampaignPlanner([0, 1], channels=[1, 7], shared_dmm=True).run(fiu):
+            for mod_id, channel, state in stage.points:
+                assert fiu.relay_state(mod_id)[channel - 1] == state
+                points += 1
+        assert points == 2 * 2 * 4
+        assert fiu.relay_state(0) == fiu.relay_state(1) == [FIUState.CONNECTED] * 24
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: passed")
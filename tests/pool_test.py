@@ -0,0 +1,80 @@
+import sys
+sys.path.append("src")
+from fiu import FIU, FIUState, FIUException, FIUTimeoutError, SimulatedFIU, DefaultPortSettings, InterfacePool
+
+def make_pool(created):
+    def factory(port, port_settings):
+        sim = SimulatedFIU([0, 1], port_settings)
+        created.append(sim)
+        return sim
+    return InterfacePool(factory)
+
+def test_reuse_across_fiu_instances():
+    created = []
+    pool = make_pool(created)
+    for _ in range(3):
+        with FIU([0, 1], "SIM", pool=pool) as fiu:
+            fiu.set_open_circuit_fault(0, 3)
+    assert len(created) == 1 and created[0].serial.is_open
+    #reset_on_exit reconnected the channel before the interface was returned
+    assert created[0].modules[0].states[2] == FIUState.CONNECTED
+    pool.close_all()
+    assert not created[0].serial.is_open
+
+def test_different_settings_rejected():
+    pool = make_pool([])
+    pool.acquire("SIM", DefaultPortSettings(), [0])
+    try:
+        pool.acquire("SIM", DefaultPortSettings(baud_rate=9600), [0])
+    except RuntimeError:
+        pass
+    else:
+        assert False, "expected the port to be rejected"
+    pool.close_all()
+
+def test_failed_verification_evicts_interface():
+    created = []
+    pool = make_pool(created)
+    settings = DefaultPortSettings(response_timeout=0.05)
+    try:
+        pool.acquire("SIM", settings, [0, 5])
+    except FIUTimeoutError:
+        pass
+    else:
+        assert False, "expected module 5 to time out"
+    assert not created[0].serial.is_open
+    pool.acquire("SIM", settings, [0, 1])
+    assert len(created) == 2
+    pool.close_all()
+
+def test_state_kept_between_sessions():
+    created = []
+    pool = make_pool(created)
+    with FIU([0, 1], "SIM", pool=pool, reset_on_exit=False) as fiu:
+        fiu.set_voltage_measurement(0, 1)
+    assert created[0].modules[0].states[0] == FIUState.VOLT_MEASUREMENT
+    with FIU([0, 1], "SIM", pool=pool, reset_on_exit=False) as fiu:
+        #the new session's state manager is loaded from hardware on connect, before any state check
+        fiu.configure(True)
+        try:
+            fiu.set_voltage_measurement(1, 1)
+        except FIUException as e:
+            assert e.code == 5010
+        else:
+            assert False, "second channel put on the shared DMM"
+        fiu.configure(False)
+        try:
+            fiu.set_short_circuit_fault(0, 2)
+        except FIUException as e:
+            assert e.code == 5010
+        else:
+            assert False, "second channel put on the module's fault bus"
+        assert fiu.relay_state(0, cached=True)[0] == FIUState.VOLT_MEASUREMENT
+    assert created[0].modules[1].states[0] == FIUState.CONNECTED
+    pool.close_all()
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: passed")
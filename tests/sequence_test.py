@@ -0,0 +1,99 @@
+import sys
+sys.path.append("src")
+from time import monotonic, sleep
+from fiu import FIU, FIUState, FIUException, SimulatedFIU, DefaultPortSettings, RetryPolicy
+from fiu import FaultSequence, SequenceStep
+
+#how late a step may be sent after its scheduled time
+MAX_LATENCY = 0.01
+
+def test_invalid_timeline_sends_nothing():
+    sim = SimulatedFIU([0])
+    with FIU([0], "SIM", sim) as fiu:
+        metrics = fiu.enable_metrics()
+        #the second channel on the module's DMM bus is only caught by validating the whole timeline
+        steps = [(0.0, 0, 1, FIUState.DISCONNECTED), (0.01, 0, 2, FIUState.VOLT_MEASUREMENT),
+                 (0.02, 0, 3, FIUState.CURR_MEASUREMENT)]
+        try:
+            FaultSequence(fiu, steps)
+        except FIUException as e:
+            assert e.code == 5010
+        else:
+            assert False, "expected an unsafe transition"
+        assert metrics.commands == {}
+        assert sim.modules[0].states[:3] == [FIUState.CONNECTED] * 3
+
+def test_steps_run_in_order():
+    sim = SimulatedFIU([0, 1])
+    with FIU([0, 1], "SIM", sim) as fiu:
+        #steps are given out of order, and run by t_offset
+        steps = [SequenceStep(0.04, 0, 1, FIUState.CONNECTED), SequenceStep(0.0, 0, 1, FIUState.DISCONNECTED),
+                 SequenceStep(0.02, 1, 5, FIUState.FAULT_TO_GND), (0.03, 1, 5, FIUState.CONNECTED)]
+        results = FaultSequence(fiu, steps).run()
+        assert [result.step.t_offset for result in results] == [0.0, 0.02, 0.03, 0.04]
+        for result in results:
+            assert result.scheduled == result.step.t_offset
+            assert result.scheduled <= result.sent <= result.completed
+            assert 0 <= result.latency < MAX_LATENCY, result
+        assert sim.modules[0].states[0] == FIUState.CONNECTED
+        assert sim.modules[1].states[4] == FIUState.CONNECTED
+        assert fiu.reconcile() == {0: [], 1: []}
+
+def test_stop():
+    sim = SimulatedFIU([0])
+    with FIU([0], "SIM", sim) as fiu:
+        sequence = FaultSequence(fiu, [(0.0, 0, 1, FIUState.DISCONNECTED), (1.0, 0, 2, FIUState.DISCONNECTED)])
+        sequence.start()
+        start = monotonic()
+        while not sequence.results and monotonic() - start < 1:
+            sleep(0.001)
+        sequence.stop()
+        results = sequence.wait(0.5)
+        assert monotonic() - start < 0.5
+        assert [result.step.channel for result in results] == [1]
+        assert sim.modules[0].states[:2] == [FIUState.DISCONNECTED, FIUState.CONNECTED]
+        #a stopped sequence can be started again, re-validated against the state it left behind
+        assert [result.step.channel for result in FaultSequence(fiu, [(0.0, 0, 2, FIUState.DISCONNECTED)]).run()] == [2]
+
+def test_step_checked_when_sent():
+    sim = SimulatedFIU([0, 1])
+    with FIU([0, 1], "SIM", sim) as fiu:
+        fiu.configure(shared_dmm=True)
+        sequence = FaultSequence(fiu, [(0.05, 1, 3, FIUState.FAULT_TO_GND)])
+        sequence.start()
+        #another thread takes the shared bus after the timeline was validated
+        fiu.set_voltage_measurement(0, 5)
+        try:
+            sequence.wait()
+        except FIUException as e:
+            assert e.code == 5010
+        else:
+            assert False, "expected an unsafe transition"
+        assert sequence.results == []
+        assert sim.modules[1].states[2] == FIUState.CONNECTED
+        assert fiu.bus_users() == [(0, 5, FIUState.VOLT_MEASUREMENT)]
+
+def test_error_raised_by_wait():
+    sim = SimulatedFIU([0], DefaultPortSettings(response_timeout=0.05))
+    with FIU([0], "SIM", sim) as fiu:
+        fiu.configure_retry(RetryPolicy(retries=0, resync=False))
+        sequence = FaultSequence(fiu, [(0.0, 0, 1, FIUState.DISCONNECTED), (0.01, 0, 2, FIUState.DISCONNECTED),
+                                       (0.02, 0, 3, FIUState.DISCONNECTED)])
+        #the second step's response is lost, so the sequence stops there
+        sim.inject_faults(None, "drop")
+        sequence.start()
+        try:
+            sequence.wait()
+        except FIUException as e:
+            assert e.code == 5001
+            assert sequence.error is e
+        else:
+            assert False, "expected a timeout"
+        assert [result.step.channel for result in sequence.results] == [1]
+        assert sim.modules[0].states[2] == FIUState.CONNECTED
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: passed")
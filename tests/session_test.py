@@ -0,0 +1,75 @@
+import sys
+sys.path.append("src")
+from time import sleep
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from fiu import FIU, FIUState, FIUException, SimulatedFIU, FIUSession, FIUSessionServer, FIUSessionClient
+
+def test_session_priority_clients():
+    sim = SimulatedFIU([0])
+    with FIU([0], "SIM", sim) as fiu, FIUSession(fiu) as session:
+        order = []
+        def submit(name, method, *args, client):
+            future = session.submit(method, *args, client=client)
+            future.add_done_callback(lambda future: order.append(name))
+            return future
+        #hold the FIU so the session thread blocks on its first request while the others are queued
+        with fiu._lock:
+            first = submit("first", "software_version", 0, client="blocker")
+            while not first.running():
+                sleep(0.001)
+            futures = [submit(f"A{channel}", "set_open_circuit_fault", 0, channel, client="A") for channel in (1, 2, 3)]
+            futures += [submit(f"B{channel}", "set_open_circuit_fault", 0, channel, client="B") for channel in (4, 5, 6)]
+            futures.append(submit("safety", "connect_channels_all", client="C"))
+        for future in [first] + futures:
+            future.result(1)
+        #the safety call runs first, then the clients take turns
+        assert order == ["first", "safety", "A1", "B4", "A2", "B5", "A3", "B6"]
+        assert sim.modules[0].states[:7] == [FIUState.DISCONNECTED] * 6 + [FIUState.CONNECTED]
+
+def test_session_compare_and_set():
+    with FIU([0], "SIM", SimulatedFIU([0])) as fiu, FIUSession(fiu) as session:
+        worker = session.client("worker")
+        assert worker.compare_and_set(0, 3, FIUState.CONNECTED, FIUState.FAULT_TO_GND)
+        assert not worker.compare_and_set(0, 3, FIUState.CONNECTED, FIUState.DISCONNECTED)
+        try:
+            session.call("_write_change", b"", 0, 1, FIUState.VOLT_MEASUREMENT)
+        except AttributeError:
+            pass
+        else:
+            assert False, "private method called through the session"
+
+def test_server_rejects_private_methods_and_bad_keys():
+    with FIU([0], "SIM", SimulatedFIU([0])) as fiu, FIUSession(fiu) as session:
+        fiu.configure(True)
+        server = FIUSessionServer(session, None)
+        try:
+            with FIUSessionClient(server.address, server.authkey) as client:
+                client.set_voltage_measurement(0, 1)
+                try:
+                    client.set_current_measurement(0, 2)
+                except FIUException as e:
+                    assert e.code == 5010
+            #a raw connection cannot reach methods the client proxy hides
+            conn = Client(server.address, authkey=server.authkey)
+            conn.send(("_write_change", (b"I002DA\r", 0, 2, FIUState.CURR_MEASUREMENT), {}, None))
+            ok, error = conn.recv()
+            assert not ok and isinstance(error, AttributeError)
+            conn.close()
+            try:
+                Client(server.address, authkey=b"wrong key")
+            except AuthenticationError:
+                pass
+            else:
+                assert False, "connected with the wrong authkey"
+            with FIUSessionClient(server.address, server.authkey) as client:
+                assert client.software_version(0) == "SIM 1.1.0"
+        finally:
+            server.close()
+        assert fiu.relay_state(0)[:2] == [FIUState.VOLT_MEASUREMENT, FIUState.CONNECTED]
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: passed")